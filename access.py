@@ -0,0 +1,182 @@
+"""Who may do what in a project, resolved once and cached.
+
+A user's role in a project is `owner` (Project.owner_id) or the role on
+their ProjectMember row. Each role includes everything below it:
+
+    viewer   read the board, comments, analytics, search and members
+    member   + comment (the role given to users who join by invite link)
+    editor   + create, edit and delete tasks and upload attachments
+    admin    + add, change and remove members (not other admins)
+    owner    + manage admins
+
+An unknown role string grants nothing.
+
+Endpoints declare the least role they need with `require_project(...)` or
+`require_task(...)`. A role is resolved in one indexed query, kept on the
+request for the rest of that request, and kept across requests for
+PROJECT_ACCESS_CACHE_TTL_SECONDS. The member endpoints invalidate entries
+they change. Other workers keep a stale entry until its TTL expires.
+"""
+import os
+from typing import NamedTuple
+from fastapi import Depends, HTTPException, Request
+from sqlalchemy import and_, select
+from sqlalchemy.exc import InvalidRequestError
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_async_db
+from auth import get_current_user
+from cache import TTLCache
+import models
+
+VIEWER, MEMBER, EDITOR, ADMIN, OWNER = "viewer", "member", "editor", "admin", "owner"
+ROLE_RANK = {VIEWER: 1, MEMBER: 2, EDITOR: 3, ADMIN: 4, OWNER: 5}
+# Roles that can be given to a ProjectMember row
+MEMBER_ROLES = (VIEWER, MEMBER, EDITOR, ADMIN)
+
+PROJECT_ACCESS_CACHE_TTL_SECONDS = float(os.getenv("PROJECT_ACCESS_CACHE_TTL_SECONDS", "30"))
+PROJECT_ACCESS_CACHE_MAX_SIZE = int(os.getenv("PROJECT_ACCESS_CACHE_MAX_SIZE", "50000"))
+# (user_id, project_id) -> role, or NO_ACCESS so that misses are cached too
+access_cache = TTLCache(maxsize=PROJECT_ACCESS_CACHE_MAX_SIZE, ttl=PROJECT_ACCESS_CACHE_TTL_SECONDS)
+NO_ACCESS = ""
+
+
+class ProjectAccess(NamedTuple):
+    project_id: int
+    role: str
+
+    def allows(self, min_role: str) -> bool:
+        return ROLE_RANK.get(self.role, 0) >= ROLE_RANK[min_role]
+
+
+class TaskAccess(NamedTuple):
+    task: models.Task
+    role: str
+
+    @property
+    def project_id(self) -> int:
+        return self.task.project_id
+
+    def allows(self, min_role: str) -> bool:
+        return ROLE_RANK.get(self.role, 0) >= ROLE_RANK[min_role]
+
+
+def invalidate_project_access(project_id: int, user_id: int):
+    access_cache.invalidate((user_id, project_id))
+
+
+def _role_columns(user_id: int, project_column):
+    member = models.ProjectMember
+    join = and_(member.project_id == project_column, member.user_id == user_id)
+    return (models.Project.owner_id, member.role), join
+
+
+def _effective_role(user_id: int, owner_id, member_role) -> str:
+    if owner_id == user_id:
+        return OWNER
+    return member_role or NO_ACCESS
+
+
+def _request_roles(request: Request) -> dict:
+    if not hasattr(request.state, "project_roles"):
+        request.state.project_roles = {}
+    return request.state.project_roles
+
+
+async def resolve_project_role(db: AsyncSession, request: Request, user_id: int, project_id: int) -> str:
+    """The user's role in the project, or NO_ACCESS (also for a missing project)."""
+    key = (user_id, project_id)
+    roles = _request_roles(request)
+    if key in roles:
+        return roles[key]
+
+    role = access_cache.get(key)
+    if role is None:
+        columns, join = _role_columns(user_id, models.Project.id)
+        row = (await db.execute(
+            select(*columns)
+            .outerjoin(models.ProjectMember, join)
+            .where(models.Project.id == project_id)
+        )).first()
+        role = _effective_role(user_id, *row) if row else NO_ACCESS
+        access_cache.set(key, role)
+
+    roles[key] = role
+    return role
+
+
+def _check(role: str, min_role: str, not_found: str):
+    if role == NO_ACCESS:
+        # Not revealing whether a project the caller cannot see exists
+        raise HTTPException(status_code=404, detail=not_found)
+    if ROLE_RANK.get(role, 0) < ROLE_RANK[min_role]:
+        raise HTTPException(status_code=403, detail=f"Requires the {min_role} role or higher in this project")
+
+
+async def check_assignee(db: AsyncSession, request: Request, user_id: int, project_id: int):
+    """400 unless `user_id` has a role in the project: tasks go only to people who can see them."""
+    if await resolve_project_role(db, request, user_id, project_id) == NO_ACCESS:
+        raise HTTPException(status_code=400, detail="The assignee is not a member of this project")
+
+
+def require_project(min_role: str):
+    """Dependency: the caller's ProjectAccess for `{project_id}`, if at least `min_role`."""
+
+    async def dependency(
+        project_id: int,
+        request: Request,
+        db: AsyncSession = Depends(get_async_db),
+        current_user: models.User = Depends(get_current_user),
+    ) -> ProjectAccess:
+        role = await resolve_project_role(db, request, current_user.id, project_id)
+        _check(role, min_role, "Project not found or unauthorized")
+        return ProjectAccess(project_id, role)
+
+    return dependency
+
+
+def require_task(min_role: str):
+    """Dependency: `{task_id}` and the caller's role in its project, if at least `min_role`.
+
+    The task is loaded in the same query as the role, attached to the
+    request's session, so endpoints can modify it directly.
+    """
+
+    async def dependency(
+        task_id: int,
+        request: Request,
+        db: AsyncSession = Depends(get_async_db),
+        current_user: models.User = Depends(get_current_user),
+    ) -> TaskAccess:
+        columns, join = _role_columns(current_user.id, models.Task.project_id)
+        row = (await db.execute(
+            select(models.Task, *columns)
+            .join(models.Project, models.Project.id == models.Task.project_id)
+            .outerjoin(models.ProjectMember, join)
+            .where(models.Task.id == task_id)
+        )).first()
+
+        role = NO_ACCESS
+        if row:
+            task, owner_id, member_role = row
+            role = _effective_role(current_user.id, owner_id, member_role)
+            key = (current_user.id, task.project_id)
+            access_cache.set(key, role)
+            _request_roles(request)[key] = role
+        _check(role, min_role, "Task not found or unauthorized")
+        return TaskAccess(row[0], role)
+
+    return dependency
+
+
+async def lock_task(db: AsyncSession, task: models.Task):
+    """Re-read `task` with SELECT ... FOR UPDATE before changing or deleting it.
+
+    `require_task` loads the task without a lock, so a concurrent writer may
+    have changed its status since. The status read here is the one the
+    project_stats counters and the task history are moved from.
+    """
+    try:
+        await db.refresh(task, with_for_update=True)
+    except InvalidRequestError:
+        # Deleted by another request while we waited for the lock
+        raise HTTPException(status_code=404, detail="Task not found or unauthorized")
@@ -16,10 +16,15 @@ from models import *       # ✅ all models, including ProjectMember
 # access to the values within the .ini file in use.
 config = context.config
 
+# Let DATABASE_URL override alembic.ini, like the app does
+if os.getenv("DATABASE_URL"):
+    config.set_main_option("sqlalchemy.url", os.environ["DATABASE_URL"])
+
 # Interpret the config file for Python logging.
-# This line sets up loggers basically.
+# This line sets up loggers basically. Existing loggers stay enabled: scripts
+# and tests run the migrations in the same process as the app (upgrade_head).
 if config.config_file_name is not None:
-    fileConfig(config.config_file_name)
+    fileConfig(config.config_file_name, disable_existing_loggers=False)
 
 # add your model's MetaData object here
 # for 'autogenerate' support
@@ -64,6 +69,13 @@ def run_migrations_online() -> None:
     and associate a connection with the context.
 
     """
+    # A caller that already holds a connection (the benchmarks' seeding)
+    # passes it in config.attributes instead of having a second one opened
+    connection = config.attributes.get("connection")
+    if connection is not None:
+        _run_with_connection(connection)
+        return
+
     connectable = engine_from_config(
         config.get_section(config.config_ini_section, {}),
         prefix="sqlalchemy.",
@@ -71,12 +83,16 @@ def run_migrations_online() -> None:
     )
 
     with connectable.connect() as connection:
-        context.configure(
-            connection=connection, target_metadata=target_metadata
-        )
+        _run_with_connection(connection)
+
+
+def _run_with_connection(connection) -> None:
+    context.configure(
+        connection=connection, target_metadata=target_metadata
+    )
 
-        with context.begin_transaction():
-            context.run_migrations()
+    with context.begin_transaction():
+        context.run_migrations()
 
 
 if context.is_offline_mode():
@@ -1,7 +1,7 @@
 """Add ProjectMember model
 
 Revision ID: 11ee9e999c66
-Revises: 
+Revises: 0a7c3e5b9d21
 Create Date: 2025-07-17 02:59:28.330979
 
 """
@@ -13,7 +13,7 @@ import sqlalchemy as sa
 
 # revision identifiers, used by Alembic.
 revision: str = '11ee9e999c66'
-down_revision: Union[str, Sequence[str], None] = None
+down_revision: Union[str, Sequence[str], None] = '0a7c3e5b9d21'
 branch_labels: Union[str, Sequence[str], None] = None
 depends_on: Union[str, Sequence[str], None] = None
 
@@ -21,14 +21,17 @@ depends_on: Union[str, Sequence[str], None] = None
 def upgrade() -> None:
     """Upgrade schema."""
     # ### commands auto generated by Alembic - please adjust! ###
-    op.add_column('tasks', sa.Column('assignee_id', sa.Integer(), nullable=True))
-    op.create_foreign_key(None, 'tasks', 'users', ['assignee_id'], ['id'])
+    # Batch mode so SQLite, which cannot add a constraint in place, rebuilds the table
+    with op.batch_alter_table('tasks') as batch_op:
+        batch_op.add_column(sa.Column('assignee_id', sa.Integer(), nullable=True))
+        batch_op.create_foreign_key('tasks_assignee_id_fkey', 'users', ['assignee_id'], ['id'])
     # ### end Alembic commands ###
 
 
 def downgrade() -> None:
     """Downgrade schema."""
     # ### commands auto generated by Alembic - please adjust! ###
-    op.drop_constraint(None, 'tasks', type_='foreignkey')
-    op.drop_column('tasks', 'assignee_id')
+    with op.batch_alter_table('tasks') as batch_op:
+        batch_op.drop_constraint('tasks_assignee_id_fkey', type_='foreignkey')
+        batch_op.drop_column('assignee_id')
     # ### end Alembic commands ###
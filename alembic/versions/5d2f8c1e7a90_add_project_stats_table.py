@@ -0,0 +1,49 @@
+"""Add project_stats table
+
+Revision ID: 5d2f8c1e7a90
+Revises: 1ca747acd688
+Create Date: 2026-10-18 09:12:41.201733
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5d2f8c1e7a90'
+down_revision: Union[str, Sequence[str], None] = '1ca747acd688'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('project_stats',
+    sa.Column('project_id', sa.Integer(), nullable=False),
+    sa.Column('total', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('pending', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('in_progress', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('done', sa.Integer(), server_default='0', nullable=False),
+    sa.ForeignKeyConstraint(['project_id'], ['projects.id'], ),
+    sa.PrimaryKeyConstraint('project_id')
+    )
+
+    # Backfill one row per existing project from the current tasks.
+    op.execute("""
+        INSERT INTO project_stats (project_id, total, pending, in_progress, done)
+        SELECT p.id,
+               COUNT(t.id),
+               COUNT(CASE WHEN t.status = 'pending' THEN 1 END),
+               COUNT(CASE WHEN t.status = 'in-progress' THEN 1 END),
+               COUNT(CASE WHEN t.status = 'done' THEN 1 END)
+        FROM projects p
+        LEFT JOIN tasks t ON t.project_id = p.id
+        GROUP BY p.id
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('project_stats')
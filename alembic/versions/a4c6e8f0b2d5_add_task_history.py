@@ -0,0 +1,70 @@
+"""Add task_events and task_daily_stats
+
+Revision ID: a4c6e8f0b2d5
+Revises: f2b8d4e6a1c3
+Create Date: 2026-10-18 17:02:14.518306
+
+"""
+from datetime import datetime
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a4c6e8f0b2d5'
+down_revision: Union[str, Sequence[str], None] = 'f2b8d4e6a1c3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('task_events',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('task_id', sa.Integer(), nullable=False),
+    sa.Column('project_id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('kind', sa.String(), nullable=False),
+    sa.Column('old_value', sa.String(), nullable=True),
+    sa.Column('new_value', sa.String(), nullable=True),
+    sa.Column('occurred_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['project_id'], ['projects.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_task_events_task_id_id', 'task_events', ['task_id', 'id'], unique=False)
+    op.create_index('ix_task_events_project_id_occurred_at', 'task_events', ['project_id', 'occurred_at'], unique=False)
+
+    op.create_table('task_daily_stats',
+    sa.Column('project_id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('created', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('completed', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('reopened', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('deleted', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('open_tasks', sa.Integer(), nullable=True),
+    sa.Column('total_tasks', sa.Integer(), nullable=True),
+    sa.Column('cycle_count', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('cycle_seconds', sa.Float(), server_default='0', nullable=False),
+    sa.Column('lead_count', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('lead_seconds', sa.Float(), server_default='0', nullable=False),
+    sa.ForeignKeyConstraint(['project_id'], ['projects.id'], ),
+    sa.PrimaryKeyConstraint('project_id', 'day')
+    )
+
+    # There is no history before this revision: start every burndown at
+    # today's counts, so the days after it have a baseline to carry forward.
+    op.execute(sa.text("""
+        INSERT INTO task_daily_stats (project_id, day, open_tasks, total_tasks)
+        SELECT project_id, :day, total - done, total
+        FROM project_stats
+    """).bindparams(sa.bindparam('day', datetime.utcnow().date(), type_=sa.Date())))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('task_daily_stats')
+    op.drop_index('ix_task_events_project_id_occurred_at', table_name='task_events')
+    op.drop_index('ix_task_events_task_id_id', table_name='task_events')
+    op.drop_table('task_events')
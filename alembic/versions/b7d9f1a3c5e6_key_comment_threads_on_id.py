@@ -0,0 +1,32 @@
+"""Key comment threads on id
+
+Revision ID: b7d9f1a3c5e6
+Revises: a4c6e8f0b2d5
+Create Date: 2026-10-18 18:26:09.331470
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7d9f1a3c5e6'
+down_revision: Union[str, Sequence[str], None] = 'a4c6e8f0b2d5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # CONCURRENTLY (Postgres) keeps comments writable while the index builds
+    with op.get_context().autocommit_block():
+        op.create_index('ix_comments_task_id_id', 'comments', ['task_id', 'id'], unique=False, postgresql_concurrently=True)
+        op.drop_index('ix_comments_task_id_timestamp_id', table_name='comments', postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.create_index('ix_comments_task_id_timestamp_id', 'comments', ['task_id', 'timestamp', 'id'], unique=False, postgresql_concurrently=True)
+        op.drop_index('ix_comments_task_id_id', table_name='comments', postgresql_concurrently=True)
@@ -0,0 +1,55 @@
+"""Add composite indexes for hot query paths
+
+Revision ID: c3e9a4b1f6d2
+Revises: 8b41c0d7e2a3
+Create Date: 2026-10-18 12:40:55.918302
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3e9a4b1f6d2'
+down_revision: Union[str, Sequence[str], None] = '8b41c0d7e2a3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# (name, table, columns, unique) -- keep in step with __table_args__ in models.py
+INDEXES = [
+    ('ix_projects_owner_id_id', 'projects', ['owner_id', 'id'], False),
+    ('uq_project_members_project_id_user_id', 'project_members', ['project_id', 'user_id'], True),
+    ('ix_project_members_user_id', 'project_members', ['user_id'], False),
+    ('ix_tasks_project_id_id', 'tasks', ['project_id', 'id'], False),
+    ('ix_tasks_project_id_status', 'tasks', ['project_id', 'status'], False),
+    ('ix_tasks_project_id_due_date', 'tasks', ['project_id', 'due_date'], False),
+    ('ix_tasks_assignee_id', 'tasks', ['assignee_id'], False),
+    ('ix_attachments_task_id', 'attachments', ['task_id'], False),
+    ('ix_comments_task_id_timestamp_id', 'comments', ['task_id', 'timestamp', 'id'], False),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # The unique membership index cannot be built over duplicate rows; keep the oldest.
+    op.execute("""
+        DELETE FROM project_members
+        WHERE id NOT IN (
+            SELECT MIN(id) FROM project_members GROUP BY project_id, user_id
+        )
+    """)
+
+    # CONCURRENTLY (Postgres) keeps the tables writable while the indexes build,
+    # which is only allowed outside a transaction.
+    with op.get_context().autocommit_block():
+        for name, table, columns, unique in INDEXES:
+            op.create_index(name, table, columns, unique=unique, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        for name, table, _, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
@@ -0,0 +1,67 @@
+"""Add full-text search columns and indexes
+
+Revision ID: e5f1a7c2d9b4
+Revises: c3e9a4b1f6d2
+Create Date: 2026-10-18 14:05:12.417730
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+from search import POSTGRES_SEARCH_VECTORS, SQLITE_FTS_COLUMNS, fts_ddl, search_vector_ddl, search_vector_index_name
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5f1a7c2d9b4'
+down_revision: Union[str, Sequence[str], None] = 'c3e9a4b1f6d2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _sqlite_upgrade():
+    for table in SQLITE_FTS_COLUMNS:
+        for statement in fts_ddl(table):
+            op.execute(statement)
+        # Index the rows that already exist
+        op.execute(f"INSERT INTO {table}_fts({table}_fts) VALUES ('rebuild')")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        _sqlite_upgrade()
+        return
+    if dialect != 'postgresql':
+        return
+
+    # Adding a stored generated column rewrites the table and fills it in
+    for table in POSTGRES_SEARCH_VECTORS:
+        op.execute(search_vector_ddl(table))
+
+    with op.get_context().autocommit_block():
+        for table in POSTGRES_SEARCH_VECTORS:
+            op.create_index(
+                search_vector_index_name(table), table, ['search_vector'],
+                postgresql_using='gin', postgresql_concurrently=True,
+            )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        for table in SQLITE_FTS_COLUMNS:
+            for suffix in ('ai', 'ad', 'au'):
+                op.execute(f'DROP TRIGGER IF EXISTS {table}_fts_{suffix}')
+            op.execute(f'DROP TABLE IF EXISTS {table}_fts')
+        return
+    if dialect != 'postgresql':
+        return
+
+    with op.get_context().autocommit_block():
+        for table in reversed(list(POSTGRES_SEARCH_VECTORS)):
+            op.drop_index(search_vector_index_name(table), table_name=table, postgresql_concurrently=True)
+    for table in reversed(list(POSTGRES_SEARCH_VECTORS)):
+        op.drop_column(table, 'search_vector')
@@ -0,0 +1,28 @@
+"""Add project_stats.version
+
+Revision ID: f2b8d4e6a1c3
+Revises: e5f1a7c2d9b4
+Create Date: 2026-10-18 15:21:37.604118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2b8d4e6a1c3'
+down_revision: Union[str, Sequence[str], None] = 'e5f1a7c2d9b4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('project_stats', sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('project_stats', 'version')
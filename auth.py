@@ -1,11 +1,15 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Body
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
-from sqlalchemy.orm import Session
-from database import get_db
+from sqlalchemy import event, select
+from sqlalchemy.orm import make_transient_to_detached
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_async_db
 from models import User
-from passlib.context import CryptContext
 from datetime import datetime, timedelta
+from cache import TTLCache
+from utils import hash_password_async
+import os
 
 router = APIRouter(prefix="/auth", tags=["Authentication"])
 
@@ -15,14 +19,10 @@ ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 PASSWORD_RESET_EXPIRE_MINUTES = 15  # For reset tokens
 
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
-def hash_password(password: str):
-    return pwd_context.hash(password)
-
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+# Resolved users, keyed by id, so steady-state requests skip the users lookup
+USER_CACHE_TTL_SECONDS = float(os.getenv("USER_CACHE_TTL_SECONDS", "60"))
+USER_CACHE_MAX_SIZE = int(os.getenv("USER_CACHE_MAX_SIZE", "10000"))
+user_cache = TTLCache(maxsize=USER_CACHE_MAX_SIZE, ttl=USER_CACHE_TTL_SECONDS)
 
 def create_access_token(data: dict, expires_delta: timedelta = None):
     to_encode = data.copy()
@@ -32,7 +32,26 @@ def create_access_token(data: dict, expires_delta: timedelta = None):
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+def _detached_copy(user: User) -> User:
+    """Snapshot a user's columns into an instance no session owns, safe to share between requests."""
+    copy = User(
+        id=user.id,
+        name=user.name,
+        email=user.email,
+        password=user.password,
+        created_at=user.created_at,
+    )
+    make_transient_to_detached(copy)
+    return copy
+
+def invalidate_cached_user(user_id: int):
+    user_cache.invalidate(user_id)
+
+@event.listens_for(User, "after_delete")
+def _evict_deleted_user(mapper, connection, target):
+    invalidate_cached_user(target.id)
+
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)):
     credentials_exception = HTTPException(
         status_code=401,
         detail="Invalid or expired token",
@@ -46,15 +65,22 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
     except JWTError:
         raise credentials_exception
 
-    user = db.query(User).filter(User.id == user_id).first()
+    cached = user_cache.get(user_id)
+    if cached is not None:
+        # Attach a copy to this request's session without querying, so
+        # endpoints can still modify and commit the returned user.
+        return await db.merge(cached, load=False)
+
+    user = await db.get(User, user_id)
     if user is None:
         raise credentials_exception
+    user_cache.set(user_id, _detached_copy(user))
     return user
 
 # ✅ Request Password Reset
 @router.post("/request-password-reset")
-def request_password_reset(email: str = Body(..., embed=True), db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.email == email).first()
+async def request_password_reset(email: str = Body(..., embed=True), db: AsyncSession = Depends(get_async_db)):
+    user = await db.scalar(select(User).where(User.email == email))
     if not user:
         raise HTTPException(status_code=404, detail="User with this email does not exist.")
 
@@ -68,10 +94,10 @@ def request_password_reset(email: str = Body(..., embed=True), db: Session = Dep
 
 # ✅ Perform Password Reset
 @router.post("/reset-password")
-def reset_password(
+async def reset_password(
     token: str = Body(...),
     new_password: str = Body(..., min_length=6),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
@@ -81,11 +107,12 @@ def reset_password(
     except JWTError:
         raise HTTPException(status_code=400, detail="Invalid or expired token.")
 
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await db.get(User, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found.")
 
-    user.password = hash_password(new_password)
-    db.commit()
+    user.password = await hash_password_async(new_password)
+    await db.commit()
+    invalidate_cached_user(user.id)
 
     return {"message": "Password has been reset successfully."}
@@ -0,0 +1,177 @@
+"""Per-project event fan-out for the live task board.
+
+Mutation endpoints call `publish(project_id, *events)` after committing,
+and `GET /projects/{project_id}/events` streams them to subscribers.
+Every event is a JSON object with a `type`:
+
+    task.created        {"task": TaskOut}
+    task.updated        {"task": {"id": ..., <changed fields>}}
+    task.deleted        {"task_id": ...}
+    comment.created     {"task_id": ..., "comment": CommentOut}
+    attachment.created  {"task_id": ..., "attachment": AttachmentOut}
+    resync              events were lost; reload the board
+
+EVENT_BROKER picks the transport. `memory` (the default) only reaches
+subscribers in the same process. `postgres` relays every event through
+LISTEN/NOTIFY, so all workers behind a load balancer see each other's
+writes. It needs asyncpg.
+"""
+import asyncio
+import json
+import logging
+import os
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy.engine import make_url
+from database import DATABASE_URL
+
+logger = logging.getLogger(__name__)
+
+EVENT_BROKER = os.getenv("EVENT_BROKER", "memory")  # memory | postgres
+# Events buffered per subscriber before it is told to resync instead
+SUBSCRIBER_QUEUE_SIZE = int(os.getenv("EVENT_QUEUE_SIZE", "100"))
+
+NOTIFY_CHANNEL = "teamsync_events"
+# Postgres rejects NOTIFY payloads of 8000 bytes or more
+NOTIFY_MAX_BYTES = 7900
+
+RESYNC = {"type": "resync"}
+
+
+class InProcessBroker:
+    """Fans events out to the subscribers in this process."""
+
+    def __init__(self, queue_size: int = SUBSCRIBER_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._subscribers = defaultdict(set)
+
+    async def publish(self, project_id: int, events: list):
+        self.deliver(project_id, events)
+
+    def deliver(self, project_id: int, events: list):
+        for queue in list(self._subscribers.get(project_id, ())):
+            try:
+                queue.put_nowait(events)
+            except asyncio.QueueFull:
+                # A client that cannot keep up must not block the publishers;
+                # drop its backlog and have it reload the board instead.
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait([RESYNC])
+
+    def deliver_all(self, events: list):
+        for project_id in list(self._subscribers):
+            self.deliver(project_id, events)
+
+    @asynccontextmanager
+    async def subscribe(self, project_id: int):
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers[project_id].add(queue)
+        try:
+            yield queue
+        finally:
+            subscribers = self._subscribers.get(project_id)
+            if subscribers is not None:
+                subscribers.discard(queue)
+                if not subscribers:
+                    del self._subscribers[project_id]
+
+    async def close(self):
+        pass
+
+
+class PostgresBroker(InProcessBroker):
+    """Relays events between workers with Postgres LISTEN/NOTIFY.
+
+    Each worker holds one asyncpg connection that LISTENs on NOTIFY_CHANNEL
+    and hands every notification to its local subscribers. A worker's own
+    events also make the round trip, so all workers see the same order.
+    """
+
+    def __init__(self, dsn: str, queue_size: int = SUBSCRIBER_QUEUE_SIZE):
+        super().__init__(queue_size)
+        self.dsn = dsn
+        self._conn = None
+        self._reconnecting = None
+        self._connect_lock = asyncio.Lock()
+        # asyncpg runs one statement at a time per connection
+        self._notify_lock = asyncio.Lock()
+
+    async def _connection(self):
+        if self._conn is not None and not self._conn.is_closed():
+            return self._conn
+        async with self._connect_lock:
+            if self._conn is None or self._conn.is_closed():
+                import asyncpg
+
+                conn = await asyncpg.connect(self.dsn)
+                await conn.add_listener(NOTIFY_CHANNEL, self._on_notify)
+                conn.add_termination_listener(self._on_terminate)
+                self._conn = conn
+        return self._conn
+
+    def _on_notify(self, conn, pid, channel, payload):
+        message = json.loads(payload)
+        self.deliver(message["project_id"], message["events"])
+
+    def _on_terminate(self, conn):
+        # Anything published while reconnecting is lost
+        logger.warning("Event broker lost its LISTEN connection, reconnecting")
+        self.deliver_all([RESYNC])
+        if self._subscribers:
+            # Keep a reference so the task is not garbage-collected mid-flight
+            self._reconnecting = asyncio.get_running_loop().create_task(self._reconnect())
+
+    async def _reconnect(self):
+        try:
+            await self._connection()
+        except Exception:
+            # The next publish or subscribe tries again
+            logger.exception("Event broker could not reconnect")
+
+    async def publish(self, project_id: int, events: list):
+        payload = json.dumps({"project_id": project_id, "events": events}, separators=(",", ":"))
+        if len(payload.encode()) > NOTIFY_MAX_BYTES:
+            payload = json.dumps({"project_id": project_id, "events": [RESYNC]})
+        conn = await self._connection()
+        async with self._notify_lock:
+            await conn.execute("SELECT pg_notify($1, $2)", NOTIFY_CHANNEL, payload)
+
+    @asynccontextmanager
+    async def subscribe(self, project_id: int):
+        await self._connection()
+        async with super().subscribe(project_id) as queue:
+            yield queue
+
+    async def close(self):
+        if self._conn is not None and not self._conn.is_closed():
+            await self._conn.close()
+        self._conn = None
+
+
+def _create_broker():
+    if EVENT_BROKER == "postgres":
+        # asyncpg takes a plain libpq URL
+        dsn = make_url(DATABASE_URL).set(drivername="postgresql").render_as_string(hide_password=False)
+        return PostgresBroker(dsn)
+    if EVENT_BROKER != "memory":
+        raise ValueError(f"Unknown EVENT_BROKER {EVENT_BROKER!r} (expected memory or postgres)")
+    return InProcessBroker()
+
+
+broker = _create_broker()
+
+
+async def publish(project_id: int, *events: dict):
+    """Send events for a project after its transaction has committed.
+
+    The write already succeeded, so a broker failure is logged rather than
+    turned into an error response; subscribers catch up on their next resync.
+    """
+    if not events:
+        return
+    try:
+        await broker.publish(project_id, jsonable_encoder(list(events)))
+    except Exception:
+        logger.exception("Failed to publish events for project %s", project_id)
@@ -0,0 +1,89 @@
+"""Build the precompressed copy of the frontend in static/dist/.
+
+    python build_static.py
+
+For every file under static/ this writes a copy plus `.gz` and, when the
+optional `brotli` package is installed, `.br` variants, and a manifest.json
+mapping each source path to its content hash (the ETag) and encodings. The
+app serves the build when it exists and falls back to the plain files
+otherwise, so run this as part of every deploy.
+
+The files keep their names: the frontend is pages that link to each other
+by URL and load their scripts and styles from CDNs, so nothing would refer
+to a fingerprinted name.
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import shutil
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip alone still works
+    brotli = None
+
+STATIC_DIR = "static"
+DIST_DIRNAME = "dist"
+MANIFEST_NAME = "manifest.json"
+HASH_LENGTH = 12
+
+
+def _write(path: str, data: bytes):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+def build(static_dir: str = STATIC_DIR) -> dict:
+    dist_dir = os.path.join(static_dir, DIST_DIRNAME)
+    if os.path.isdir(dist_dir):
+        shutil.rmtree(dist_dir)
+
+    manifest = {}
+    for root, dirs, files in os.walk(static_dir):
+        dirs[:] = sorted(d for d in dirs if os.path.join(root, d) != dist_dir)
+        for name in sorted(files):
+            src = os.path.join(root, name)
+            relpath = os.path.relpath(src, static_dir).replace(os.sep, "/")
+            with open(src, "rb") as f:
+                data = f.read()
+
+            digest = hashlib.sha256(data).hexdigest()
+            built = os.path.join(dist_dir, relpath)
+            _write(built, data)
+
+            encodings = []
+            # mtime=0 keeps the gzip output byte-for-byte reproducible
+            variants = [("gzip", ".gz", gzip.compress(data, compresslevel=9, mtime=0))]
+            if brotli is not None:
+                variants.insert(0, ("br", ".br", brotli.compress(data, quality=11)))
+            for encoding, suffix, compressed in variants:
+                if len(compressed) < len(data):
+                    _write(built + suffix, compressed)
+                    encodings.append(encoding)
+
+            manifest[relpath] = {
+                "hash": digest[:HASH_LENGTH],
+                "encodings": encodings,
+            }
+
+    _write(os.path.join(dist_dir, MANIFEST_NAME), json.dumps(manifest, indent=2, sort_keys=True).encode())
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the precompressed static bundle.")
+    parser.add_argument("--static-dir", default=STATIC_DIR)
+    args = parser.parse_args()
+
+    manifest = build(args.static_dir)
+    for relpath, entry in manifest.items():
+        print(f"{relpath} [{', '.join(entry['encodings']) or 'identity'}]")
+    if brotli is None:
+        print("note: brotli is not installed, only gzip variants were written")
+
+
+if __name__ == "__main__":
+    main()
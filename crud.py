@@ -0,0 +1,237 @@
+from sqlalchemy import func, case, select, insert, update, delete
+from sqlalchemy.orm import Session, selectinload
+from datetime import datetime
+import models, schemas, project_stats, task_history
+
+
+def _task_board_options():
+    return (
+        selectinload(models.Task.attachments),
+        selectinload(models.Task.comments).joinedload(models.Comment.user),
+    )
+
+
+# Optional per-task fields of the board listing (`id` is always sent), in output order
+TASK_LIST_FIELDS = ("title", "description", "status", "due_date", "assignee_id", "comment_count", "attachment_count")
+# Nested lists it can expand, none by default
+TASK_LIST_INCLUDES = ("attachments", "comments")
+
+
+def _task_list_columns() -> dict:
+    return {
+        "title": models.Task.title,
+        "description": models.Task.description,
+        "status": models.Task.status,
+        "due_date": models.Task.due_date,
+        "assignee_id": models.Task.assignee_id,
+        # Correlated counts, evaluated only for the rows on the page, from the task_id indexes
+        "comment_count": select(func.count()).where(models.Comment.task_id == models.Task.id).scalar_subquery(),
+        "attachment_count": select(func.count()).where(models.FileAttachment.task_id == models.Task.id).scalar_subquery(),
+    }
+
+
+def get_project_task_rows(db: Session, project_id: int, limit: int = None, after_id: int = None,
+                          fields=TASK_LIST_FIELDS, include=()) -> list:
+    """A project's task board as plain dicts: `id`, the requested `fields` and `include` lists.
+
+    One column query for the tasks, with comment and attachment counts
+    computed in SQL, plus one query per included list (attachments, or
+    comments with the commenter's name) however many rows it holds. No ORM
+    objects or Pydantic models are built, so the result can be encoded
+    straight to JSON. Tasks are ordered by id so that `after_id` can be
+    used as a keyset cursor.
+    """
+    columns = _task_list_columns()
+    names = [name for name in TASK_LIST_FIELDS if name in fields]
+    include = [name for name in TASK_LIST_INCLUDES if name in include]
+    query = (
+        select(models.Task.id, *(columns[name].label(name) for name in names))
+        .where(models.Task.project_id == project_id)
+    )
+    if after_id is not None:
+        query = query.where(models.Task.id > after_id)
+    query = query.order_by(models.Task.id)
+    if limit is not None:
+        query = query.limit(limit)
+
+    tasks = {}
+    for task_id, *values in db.execute(query):
+        task = tasks[task_id] = {"id": task_id, **dict(zip(names, values))}
+        for name in include:
+            task[name] = []
+    if not tasks or not include:
+        return list(tasks.values())
+    task_ids = list(tasks)
+
+    if "attachments" in include:
+        attachments = db.execute(
+            select(models.FileAttachment.task_id, models.FileAttachment.id,
+                   models.FileAttachment.filename, models.FileAttachment.filepath)
+            .where(models.FileAttachment.task_id.in_(task_ids))
+            .order_by(models.FileAttachment.id)
+        )
+        for task_id, attachment_id, filename, filepath in attachments:
+            tasks[task_id]["attachments"].append({"id": attachment_id, "filename": filename, "filepath": filepath})
+
+    if "comments" in include:
+        comments = db.execute(
+            select(models.Comment.task_id, models.Comment.id, models.Comment.content, models.Comment.timestamp,
+                   func.coalesce(models.User.name, "Unknown"))  # 👈 handle missing user
+            .outerjoin(models.User, models.User.id == models.Comment.user_id)
+            .where(models.Comment.task_id.in_(task_ids))
+            .order_by(models.Comment.id)
+        )
+        for task_id, comment_id, content, timestamp, user_name in comments:
+            tasks[task_id]["comments"].append(
+                {"id": comment_id, "content": content, "timestamp": timestamp, "user_name": user_name}
+            )
+    return list(tasks.values())
+
+
+def get_task(db: Session, task_id: int):
+    """A single task with the same eager loads as the board listing."""
+    return db.query(models.Task).options(*_task_board_options()).filter(models.Task.id == task_id).first()
+
+
+def task_to_out(t: models.Task) -> schemas.TaskOut:
+    return schemas.TaskOut(
+        id=t.id,
+        title=t.title,
+        description=t.description,
+        status=t.status,
+        due_date=t.due_date,
+        assignee_id=t.assignee_id,
+        attachments=[
+            schemas.AttachmentOut(
+                id=a.id,
+                filename=a.filename,
+                filepath=a.filepath
+            ) for a in t.attachments
+        ],
+        comments=[
+            schemas.CommentOut(
+                id=c.id,
+                content=c.content,
+                timestamp=c.timestamp,
+                user_name=c.user.name if c.user else "Unknown"  # 👈 handle missing user
+            ) for c in t.comments
+        ]
+    )
+
+
+def get_project_analytics(db: Session, project_id: int) -> dict:
+    """Status and overdue counts for a project, computed in one grouped query."""
+    now = datetime.utcnow()
+    rows = (
+        db.query(
+            models.Task.status,
+            func.count(models.Task.id),
+            func.count(case((models.Task.due_date < now, models.Task.id))),
+        )
+        .filter(models.Task.project_id == project_id)
+        .group_by(models.Task.status)
+        .all()
+    )
+
+    counts = {status: count for status, count, _ in rows}
+    return {
+        "total": sum(counts.values()),
+        "pending": counts.get("pending", 0),
+        "in_progress": counts.get("in-progress", 0),
+        "done": counts.get("done", 0),
+        "overdue": sum(overdue for status, _, overdue in rows if status != "done"),
+    }
+
+
+BATCH_UPDATE_FIELDS = ("title", "description", "status", "due_date")
+
+
+def apply_task_batch(db: Session, project_id: int, ops) -> tuple:
+    """Apply a list of `schemas.TaskBatchOp` to one project with bulk statements.
+
+    The caller has already authorized the project and commits afterwards, so
+    every valid op lands in one transaction. One SELECT resolves the ids the
+    batch refers to; updates that set the same values share one UPDATE,
+    deletes are one DELETE per table and creates one multi-row INSERT.
+    Invalid ops (a missing id or title, a task outside the project, an id
+    used twice) get an error result and are skipped without aborting the rest.
+
+    Returns `(results, stats_deltas, history)`, for `project_stats.apply_deltas`
+    and `task_history.record`.
+    """
+    results = [{"index": i, "op": op.op, "id": op.id, "ok": False, "error": None} for i, op in enumerate(ops)]
+
+    ids = {op.id for op in ops if op.op != "create" and op.id is not None}
+    # Locked until commit, so the statuses the counters move from stay current;
+    # in id order, so that two overlapping batches queue instead of deadlocking
+    current = {row.id: row for row in db.execute(
+        select(models.Task.id, models.Task.status, models.Task.due_date)
+        .where(models.Task.project_id == project_id, models.Task.id.in_(ids))
+        .order_by(models.Task.id)
+        .with_for_update()
+    )} if ids else {}
+
+    creates, updates, deletes = [], {}, []
+    seen = set()
+    deltas = {}
+    history = []
+    for result, op in zip(results, ops):
+        if op.op == "create":
+            if not op.title:
+                result["error"] = "title is required"
+                continue
+            status = op.status or "pending"
+            creates.append((result, {
+                "title": op.title,
+                "description": op.description,
+                "status": status,
+                "due_date": op.due_date,
+                "project_id": project_id,
+            }))
+            project_stats.task_change_deltas(new_status=status, created=True, deltas=deltas)
+            continue
+
+        if op.id is None:
+            result["error"] = "id is required"
+        elif op.id not in current:
+            result["error"] = "Task not found in this project"
+        elif op.id in seen:
+            result["error"] = "Task appears more than once in this batch"
+        else:
+            seen.add(op.id)
+            result["ok"] = True
+            old_status = current[op.id].status
+            if op.op == "delete":
+                deletes.append(op.id)
+                project_stats.task_change_deltas(old_status=old_status, deleted=True, deltas=deltas)
+                history += task_history.deleted(op.id, old_status)
+            else:
+                # Same semantics as PATCH /tasks/{id}: a null field is left unchanged
+                values = {f: getattr(op, f) for f in BATCH_UPDATE_FIELDS if getattr(op, f) is not None}
+                if values:
+                    updates.setdefault(tuple(sorted(values.items())), []).append(op.id)
+                    project_stats.task_change_deltas(old_status, values.get("status", old_status), deltas=deltas)
+                    history += task_history.changed(op.id, current[op.id]._asdict(), values)
+
+    for values, task_ids in updates.items():
+        db.execute(
+            update(models.Task).where(models.Task.id.in_(task_ids)).values(dict(values)),
+            execution_options={"synchronize_session": False},
+        )
+
+    if deletes:
+        # Bulk DELETE skips the ORM cascade, so remove the children first
+        for child in (models.Comment, models.FileAttachment):
+            db.execute(delete(child).where(child.task_id.in_(deletes)), execution_options={"synchronize_session": False})
+        db.execute(delete(models.Task).where(models.Task.id.in_(deletes)), execution_options={"synchronize_session": False})
+
+    if creates:
+        new_ids = db.scalars(
+            insert(models.Task).returning(models.Task.id, sort_by_parameter_order=True),
+            [row for _, row in creates],
+        ).all()
+        for (result, row), new_id in zip(creates, new_ids):
+            result.update(id=new_id, ok=True)
+            history += task_history.created(new_id, row["status"], due_date=row["due_date"])
+
+    return results, deltas, history
@@ -0,0 +1,29 @@
+"""Weak ETags and If-None-Match handling for versioned reads."""
+from typing import Optional
+from fastapi import Request, Response
+
+# Authenticated responses: browsers may keep them but must revalidate each use
+REVALIDATE_CACHE_CONTROL = "private, no-cache"
+
+
+def weak_etag(*parts) -> str:
+    return 'W/"' + "-".join(str(part) for part in parts) + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison (RFC 9110 13.1.2) of an If-None-Match header with `etag`."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return opaque in [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+
+
+def not_modified(request: Request, response: Response, etag: str) -> Optional[Response]:
+    """Put the validators on `response`; return a 304 if the client's copy is current."""
+    headers = {"ETag": etag, "Cache-Control": REVALIDATE_CACHE_CONTROL}
+    response.headers.update(headers)
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return None
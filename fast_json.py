@@ -0,0 +1,56 @@
+"""JSON responses encoded with orjson when it is installed.
+
+FastJSONResponse is the app's default response class. It is installed
+through fastapi's `Default()`, so endpoints with a response_model keep
+FastAPI's own path (Pydantic validates the return value and writes the
+bytes) and only model-less returns, such as the analytics dict, go through
+orjson.
+
+Endpoints whose data already has the response model's shape and types
+return `json_response(...)` instead, which encodes it once and skips
+response_model validation altogether.
+"""
+import json
+from datetime import date, datetime
+from fastapi import Response
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; the stdlib encoder writes the same JSON, slower
+    orjson = None
+
+# "Z" for UTC and str() for int keys, as Pydantic and json.dumps write them
+ORJSON_OPTIONS = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS if orjson else 0
+
+
+def _default(value):
+    if isinstance(value, (datetime, date)):
+        text = value.isoformat()
+        return text[:-6] + "Z" if text.endswith("+00:00") else text
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content) -> bytes:
+    """`content` (dicts, lists, str, numbers, None, datetimes) as compact UTF-8 JSON."""
+    if orjson is not None:
+        return orjson.dumps(content, option=ORJSON_OPTIONS)
+    return json.dumps(content, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+
+def json_response(content, response: Response = None) -> FastJSONResponse:
+    """Send `content` as it is: no response_model validation and no jsonable_encoder pass.
+
+    Only for data already shaped and typed like the endpoint's response model.
+    Headers set on the endpoint's injected `response` (ETag, cursor) are
+    copied over, which FastAPI does not do for a returned Response.
+    """
+    out = FastJSONResponse(content)
+    if response is not None:
+        out.raw_headers.extend(response.raw_headers)
+    return out
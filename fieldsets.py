@@ -0,0 +1,36 @@
+"""`fields=` and `include=` query parameters for sparse listings."""
+from fastapi import HTTPException, Query
+import crud
+
+
+def parse_names(value: str, allowed: tuple, param: str) -> tuple:
+    """A comma-separated parameter as a tuple of known names; 400 on anything else."""
+    names = [name.strip() for name in value.split(",") if name.strip()]
+    unknown = [name for name in names if name not in allowed]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown {param}: {', '.join(unknown)} (expected any of {', '.join(allowed)})",
+        )
+    return tuple(dict.fromkeys(names))
+
+
+class TaskListParams:
+    """`fields` / `include` for the task board listing.
+
+    By default every field is sent, with the comments and attachments as
+    counts; `include` adds the full lists.
+    """
+
+    def __init__(
+        self,
+        fields: str = Query(None, description="Comma-separated task fields to send besides id "
+                                              f"(default: all of {','.join(crud.TASK_LIST_FIELDS)})"),
+        include: str = Query(None, description="Comma-separated lists to expand: "
+                                               f"{','.join(crud.TASK_LIST_INCLUDES)}"),
+    ):
+        self.fields = (
+            crud.TASK_LIST_FIELDS if fields is None
+            else parse_names(fields, ("id",) + crud.TASK_LIST_FIELDS, "fields")
+        )
+        self.include = parse_names(include, crud.TASK_LIST_INCLUDES, "include") if include else ()
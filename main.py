@@ -1,22 +1,53 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
+from fastapi.datastructures import Default
+from sqlalchemy.orm import configure_mappers
 from routers import users, projects, tasks, comments , members # ✅ added comments
-from models import Base
-from database import engine
+from database import engine, async_engine
 from fastapi.openapi.utils import get_openapi
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from static_files import PrecompressedStaticFiles
 from auth import router as auth_router
 from routers import members  # 👈 Add this
+from routers import admin, events
+from routers import metrics as metrics_router
+from metrics import MetricsMiddleware, instrument_engine
+from fast_json import FastJSONResponse
+import storage
+import query_audit
+import schema_version
+import broker
+import utils
 
 
+# ✅ Startup and shutdown, once per worker process
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # The schema comes from `alembic upgrade head`; only its revision is checked here
+    await schema_version.verify_schema(engine, async_engine)
+    # Resolve the ORM relationships now rather than in the first request's first query
+    configure_mappers()
+    yield
+    await broker.broker.close()
+    utils.shutdown_pool()
 
 
-# ✅ Create database tables on startup
-Base.metadata.create_all(bind=engine)
+# ✅ FastAPI app instance
+# Default() keeps FastAPI's Pydantic-to-bytes path for endpoints with a
+# response_model; a plain class here would turn it off for all of them
+app = FastAPI(lifespan=lifespan, default_response_class=Default(FastJSONResponse))
 
+# ✅ Per-route latency, status and SQL metrics, scraped from /metrics
+engines = [engine] if async_engine is None else [engine, async_engine.sync_engine]
+app.add_middleware(MetricsMiddleware)
+for instrumented in engines:
+    instrument_engine(instrumented)
 
-# ✅ FastAPI app instance
-app = FastAPI()
+# ✅ Refuse oversized uploads before their body is read and spooled
+app.add_middleware(storage.UploadLimitMiddleware)
+
+# ✅ Development only: warn about repeated statement shapes (N+1) per request
+if query_audit.QUERY_AUDIT:
+    query_audit.install(app, *engines)
 
 
 # ✅ Register all routers
@@ -26,6 +57,9 @@ app.include_router(tasks.router)
 app.include_router(comments.router) 
 app.include_router(auth_router) # ✅ newly added
 app.include_router(members.router)  # 👈 Register it
+app.include_router(admin.router)
+app.include_router(events.router)
+app.include_router(metrics_router.router)
 
 # ✅ Fix Swagger Authorize UI to show Bearer token
 def custom_openapi():
@@ -52,15 +86,16 @@ def custom_openapi():
 
 app.openapi = custom_openapi
 
-# ✅ Serve static frontend files
-app.mount("/static", StaticFiles(directory="static"), name="static")
+# ✅ Serve static frontend files (precompressed build from build_static.py when present)
+static_app = PrecompressedStaticFiles(directory="static")
+app.mount("/static", static_app, name="static")
 
 # ✅ Serve index.html at root path
 @app.get("/")
-def serve_home():
-    return FileResponse("static/index.html")
+async def serve_home(request: Request):
+    return await static_app.get_response("index.html", request.scope)
 
 # ✅ Serve uploaded files
 @app.get("/uploads/{filename}")
-def serve_upload(filename: str):
-    return FileResponse(f"uploads/{filename}")
+async def serve_upload(filename: str, request: Request):
+    return storage.serve_upload(request, filename)
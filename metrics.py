@@ -0,0 +1,252 @@
+"""Request metrics in the Prometheus text format, served on /metrics.
+
+MetricsMiddleware times every request and labels it with the route
+template Starlette matched (`/projects/{project_id}/tasks`, never the raw
+path), so the number of series stays bounded. SQL statements and the time
+spent in them are attributed to the request that issued them through
+engine events, on both the sync and the async engine.
+
+Metrics live in the worker process: with several workers each one keeps,
+and reports, its own.
+"""
+import bisect
+import time
+from contextvars import ContextVar
+from threading import Lock
+from sqlalchemy import event
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DB_SECONDS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 50, 100)
+
+# Requests that matched no route share one label instead of their raw paths
+UNMATCHED_ROUTE = "unmatched"
+# Requests still being routed when /metrics is scraped
+UNROUTED = "unrouted"
+INF_LABEL = 'le="+Inf"'
+
+# [statements, seconds] for the request being served, shared with the
+# threadpool (which copies the context) and the async engine's greenlets
+_request_sql = ContextVar("request_sql", default=None)
+
+
+class Histogram:
+    """Bucket counts, sum and count for one label set. Callers hold the registry lock."""
+
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self, buckets):
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, buckets, value):
+        index = bisect.bisect_left(buckets, value)
+        if index < len(buckets):
+            self.counts[index] += 1
+        self.sum += value
+        self.count += 1
+
+
+class RequestMetrics:
+    """Everything recorded about finished and in-flight requests in this process."""
+
+    def __init__(self):
+        self._lock = Lock()
+        self.requests = {}  # (method, route, status) -> count
+        self.latency = {}  # (method, route) -> Histogram
+        self.statements = {}
+        self.db_seconds = {}
+        self._in_flight = {}  # id(scope) -> scope
+
+    def start(self, scope: dict):
+        with self._lock:
+            self._in_flight[id(scope)] = scope
+
+    def finish(self, scope: dict, status: int, seconds: float, statements: int, db_seconds: float):
+        key = (scope["method"], route_template(scope))
+        with self._lock:
+            del self._in_flight[id(scope)]
+            request_key = (*key, str(status))
+            self.requests[request_key] = self.requests.get(request_key, 0) + 1
+            for histograms, buckets, value in (
+                (self.latency, LATENCY_BUCKETS, seconds),
+                (self.statements, STATEMENT_BUCKETS, statements),
+                (self.db_seconds, DB_SECONDS_BUCKETS, db_seconds),
+            ):
+                histogram = histograms.get(key)
+                if histogram is None:
+                    histogram = histograms[key] = Histogram(buckets)
+                histogram.observe(buckets, value)
+
+    def in_flight(self) -> dict:
+        """(method, route) -> requests currently being served."""
+        with self._lock:
+            scopes = list(self._in_flight.values())
+        counts = {}
+        for scope in scopes:
+            key = (scope["method"], route_template(scope, UNROUTED))
+            counts[key] = counts.get(key, 0) + 1
+        return counts
+
+
+request_metrics = RequestMetrics()
+
+
+def route_template(scope: dict, default: str = UNMATCHED_ROUTE) -> str:
+    # The router stores the matched route in the scope before handing it on
+    route = scope.get("route")
+    return getattr(route, "path", None) or default
+
+
+class MetricsMiddleware:
+    """Plain ASGI middleware: no per-request Request object or extra task."""
+
+    def __init__(self, app, metrics: RequestMetrics = request_metrics):
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status = 500  # if the app raises before responding
+        sql = [0, 0.0]
+        token = _request_sql.set(sql)
+        self.metrics.start(scope)
+        start = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            self.metrics.finish(scope, status, time.perf_counter() - start, sql[0], sql[1])
+            _request_sql.reset(token)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _request_sql.get() is not None:
+        context._metrics_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    sql = _request_sql.get()
+    start = getattr(context, "_metrics_start", None)
+    if sql is not None and start is not None:
+        sql[0] += 1
+        sql[1] += time.perf_counter() - start
+
+
+def instrument_engine(engine):
+    """Count statements and DB time per request on `engine` (a sync Engine)."""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+# -------------------------------
+# Text exposition
+# -------------------------------
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _labels(names, values, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}"
+
+
+def _number(value) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _write_family(lines, name, kind, help_text, label_names, samples: dict):
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} {kind}")
+    for label_values, value in sorted(samples.items()):
+        lines.append(f"{name}{_labels(label_names, label_values)} {_number(value)}")
+
+
+def _write_histograms(lines, name, help_text, buckets, histograms: dict):
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} histogram")
+    label_names = ("method", "route")
+    for label_values, histogram in sorted(histograms.items()):
+        cumulative = 0
+        for bound, count in zip(buckets, histogram.counts):
+            cumulative += count
+            le = 'le="%s"' % _number(bound)
+            lines.append(f"{name}_bucket{_labels(label_names, label_values, le)} {cumulative}")
+        lines.append(f"{name}_bucket{_labels(label_names, label_values, INF_LABEL)} {histogram.count}")
+        lines.append(f"{name}_sum{_labels(label_names, label_values)} {_number(histogram.sum)}")
+        lines.append(f"{name}_count{_labels(label_names, label_values)} {histogram.count}")
+
+
+def _copy_histograms(histograms: dict) -> dict:
+    copies = {}
+    for key, histogram in histograms.items():
+        copy = Histogram(())
+        copy.counts, copy.sum, copy.count = list(histogram.counts), histogram.sum, histogram.count
+        copies[key] = copy
+    return copies
+
+
+def render(metrics: RequestMetrics = request_metrics, pools: dict = None, caches: dict = None) -> str:
+    """The current metrics in the Prometheus text format (version 0.0.4).
+
+    `pools` maps an engine label to a PoolMetrics snapshot and `caches` maps
+    a cache label to TTLCache.stats(); both are optional extras.
+    """
+    with metrics._lock:
+        requests = dict(metrics.requests)
+        latency = _copy_histograms(metrics.latency)
+        statements = _copy_histograms(metrics.statements)
+        db_seconds = _copy_histograms(metrics.db_seconds)
+    in_flight = metrics.in_flight()
+
+    lines = []
+    _write_family(lines, "teamsync_http_requests_total", "counter",
+                  "Finished HTTP requests by route template and status.",
+                  ("method", "route", "status"), requests)
+    _write_family(lines, "teamsync_http_requests_in_flight", "gauge",
+                  "HTTP requests being served.", ("method", "route"), in_flight)
+    _write_histograms(lines, "teamsync_http_request_duration_seconds",
+                      "Time from receiving a request to finishing its response.", LATENCY_BUCKETS, latency)
+    _write_histograms(lines, "teamsync_http_request_db_statements",
+                      "SQL statements executed per request.", STATEMENT_BUCKETS, statements)
+    _write_histograms(lines, "teamsync_http_request_db_seconds",
+                      "Time per request spent executing SQL statements.", DB_SECONDS_BUCKETS, db_seconds)
+
+    if pools:
+        for name, field, kind, help_text in (
+            ("teamsync_db_pool_in_use", "in_use", "gauge", "Connections checked out of the pool."),
+            ("teamsync_db_pool_idle", "idle", "gauge", "Connections idle in the pool."),
+            ("teamsync_db_pool_overflow", "overflow", "gauge", "Connections open beyond the pool size."),
+            ("teamsync_db_pool_checkouts_total", "checkouts", "counter", "Connections checked out since startup."),
+            ("teamsync_db_pool_checkout_timeouts_total", "checkout_timeouts", "counter",
+             "Checkouts that gave up waiting for a connection."),
+            ("teamsync_db_pool_checkout_wait_seconds_total", "checkout_wait_seconds_total", "counter",
+             "Time spent waiting for a connection."),
+        ):
+            # SQLite's pools report no size or usage
+            samples = {(engine,): snapshot[field] for engine, snapshot in pools.items() if field in snapshot}
+            _write_family(lines, name, kind, help_text, ("engine",), samples)
+
+    if caches:
+        for name, field, kind, help_text in (
+            ("teamsync_cache_size", "size", "gauge", "Entries in the cache."),
+            ("teamsync_cache_hits_total", "hits", "counter", "Cache lookups that found a live entry."),
+            ("teamsync_cache_misses_total", "misses", "counter", "Cache lookups that found nothing or an expired entry."),
+            ("teamsync_cache_evictions_total", "evictions", "counter", "Entries dropped to stay under the size limit."),
+        ):
+            samples = {(cache,): stats[field] for cache, stats in caches.items()}
+            _write_family(lines, name, kind, help_text, ("cache",), samples)
+
+    return "\n".join(lines) + "\n"
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, Date, Float, Text, ForeignKey, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from database import Base
@@ -21,6 +21,9 @@ class User(Base):
 # 🗂 Project Model
 class Project(Base):
     __tablename__ = "projects"
+    __table_args__ = (
+        Index("ix_projects_owner_id_id", "owner_id", "id"),  # owner's project list, keyset by id
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String, nullable=False)
@@ -30,16 +33,78 @@ class Project(Base):
     owner = relationship("User", back_populates="projects")
     tasks = relationship("Task", back_populates="project")
     members = relationship("ProjectMember", back_populates="project", cascade="all, delete-orphan")
+    stats = relationship("ProjectStats", back_populates="project", uselist=False, cascade="all, delete-orphan")
+
+
+# 📊 ProjectStats Model
+class ProjectStats(Base):
+    __tablename__ = "project_stats"
+
+    # Per-status task counters, kept in step by project_stats.record_task_change
+    project_id = Column(Integer, ForeignKey("projects.id"), primary_key=True)
+    total = Column(Integer, nullable=False, default=0, server_default="0")
+    pending = Column(Integer, nullable=False, default=0, server_default="0")
+    in_progress = Column(Integer, nullable=False, default=0, server_default="0")
+    done = Column(Integer, nullable=False, default=0, server_default="0")
+    # Bumped by every task, comment, attachment and member write; the ETag of the project's reads
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+
+    project = relationship("Project", back_populates="stats")
+
+
+# 🕓 TaskEvent Model
+class TaskEvent(Base):
+    __tablename__ = "task_events"
+    __table_args__ = (
+        Index("ix_task_events_task_id_id", "task_id", "id"),  # a task's history, cycle time on completion
+        Index("ix_task_events_project_id_occurred_at", "project_id", "occurred_at"),
+    )
+
+    # Append-only, written by task_history.record. No foreign key on the task
+    # or the actor: the history outlives both.
+    id = Column(Integer, primary_key=True)
+    task_id = Column(Integer, nullable=False)
+    project_id = Column(Integer, ForeignKey("projects.id"), nullable=False)
+    user_id = Column(Integer, nullable=True)
+    kind = Column(String, nullable=False)  # created / status / assignee / due_date / deleted
+    old_value = Column(String, nullable=True)
+    new_value = Column(String, nullable=True)
+    occurred_at = Column(DateTime, nullable=False)  # UTC
+
+
+# 📈 TaskDailyStats Model
+class TaskDailyStats(Base):
+    __tablename__ = "task_daily_stats"
+
+    # One row per project and UTC day with any task events, rolled up by task_history.record
+    project_id = Column(Integer, ForeignKey("projects.id"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    created = Column(Integer, nullable=False, default=0, server_default="0")
+    completed = Column(Integer, nullable=False, default=0, server_default="0")
+    reopened = Column(Integer, nullable=False, default=0, server_default="0")
+    deleted = Column(Integer, nullable=False, default=0, server_default="0")
+    # Task counts at the end of the day (after its last write)
+    open_tasks = Column(Integer, nullable=True)
+    total_tasks = Column(Integer, nullable=True)
+    # Sums behind the average cycle (in progress -> done) and lead (created -> done) times
+    cycle_count = Column(Integer, nullable=False, default=0, server_default="0")
+    cycle_seconds = Column(Float, nullable=False, default=0, server_default="0")
+    lead_count = Column(Integer, nullable=False, default=0, server_default="0")
+    lead_seconds = Column(Float, nullable=False, default=0, server_default="0")
 
 
 # 👥 ProjectMember Model
 class ProjectMember(Base):
     __tablename__ = "project_members"
+    __table_args__ = (
+        Index("uq_project_members_project_id_user_id", "project_id", "user_id", unique=True),
+        Index("ix_project_members_user_id", "user_id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
     project_id = Column(Integer, ForeignKey("projects.id"))
-    role = Column(String, default="editor")  # admin / editor / viewer
+    role = Column(String, default="editor")  # admin / editor / member / viewer (see access.py)
 
     user = relationship("User", back_populates="memberships")
     project = relationship("Project", back_populates="members")
@@ -48,7 +113,13 @@ class ProjectMember(Base):
 # ✅ Task Model
 class Task(Base):
     __tablename__ = "tasks"
-    __table_args__ = {'extend_existing': True}
+    __table_args__ = (
+        Index("ix_tasks_project_id_id", "project_id", "id"),  # board listing, keyset by id
+        Index("ix_tasks_project_id_status", "project_id", "status"),  # analytics by status
+        Index("ix_tasks_project_id_due_date", "project_id", "due_date"),  # overdue count
+        Index("ix_tasks_assignee_id", "assignee_id"),
+        {'extend_existing': True},
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String, nullable=False)
@@ -68,10 +139,15 @@ class Task(Base):
 # 📎 FileAttachment Model
 class FileAttachment(Base):
     __tablename__ = "attachments"
+    __table_args__ = (
+        Index("ix_attachments_task_id", "task_id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     filename = Column(String, nullable=False)
     filepath = Column(String, nullable=False)
+    content_hash = Column(String(64), index=True, nullable=True)  # SHA-256, shared by duplicate uploads
+    size = Column(Integer, nullable=True)
     task_id = Column(Integer, ForeignKey("tasks.id"))
 
     task = relationship("Task", back_populates="attachments")
@@ -80,6 +156,9 @@ class FileAttachment(Base):
 # 💬 Comment Model
 class Comment(Base):
     __tablename__ = "comments"
+    __table_args__ = (
+        Index("ix_comments_task_id_id", "task_id", "id"),  # thread listing, keyset by id
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     content = Column(Text, nullable=False)
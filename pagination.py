@@ -0,0 +1,58 @@
+import base64
+import json
+from fastapi import HTTPException, Query
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(*values) -> str:
+    """Pack the sort key of the last row on a page into an opaque token."""
+    raw = json.dumps(values, default=str, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> list:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid pagination cursor")
+    if not isinstance(values, list):
+        raise HTTPException(status_code=400, detail="Invalid pagination cursor")
+    return values
+
+
+def decode_id_cursor(cursor: str) -> int:
+    values = decode_cursor(cursor)
+    if len(values) != 1 or not isinstance(values[0], int):
+        raise HTTPException(status_code=400, detail="Invalid pagination cursor")
+    return values[0]
+
+
+def decode_offset_cursor(cursor: str) -> int:
+    """For listings without a stable keyset: the cursor is the offset of the next page."""
+    offset = decode_id_cursor(cursor)
+    if offset < 0:
+        raise HTTPException(status_code=400, detail="Invalid pagination cursor")
+    return offset
+
+
+class PageParams:
+    """`limit` / `after` query parameters shared by every paginated listing."""
+
+    def __init__(
+        self,
+        limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+        after: str = Query(None, description="Opaque cursor from the previous page's X-Next-Cursor header"),
+    ):
+        self.limit = limit
+        self.after = after
+
+
+def split_page(rows: list, limit: int):
+    """Rows are fetched with `limit + 1`; the extra row only signals another page."""
+    has_more = len(rows) > limit
+    return rows[:limit], has_more
@@ -0,0 +1,65 @@
+import time
+from threading import Lock
+from sqlalchemy import exc
+
+
+class PoolMetrics:
+    """Counters for one connection pool: checkout waits, timeouts and overflow use."""
+
+    def __init__(self):
+        self._lock = Lock()
+        self.checkouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self.timeouts = 0
+        self.overflow_checkouts = 0
+
+    def record_checkout(self, waited: float, overflow: bool = False, timed_out: bool = False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+                if overflow:
+                    self.overflow_checkouts += 1
+            self.wait_seconds_total += waited
+            self.wait_seconds_max = max(self.wait_seconds_max, waited)
+
+    def snapshot(self, pool) -> dict:
+        with self._lock:
+            counters = {
+                "checkouts": self.checkouts,
+                "checkout_wait_seconds_total": round(self.wait_seconds_total, 6),
+                "checkout_wait_seconds_max": round(self.wait_seconds_max, 6),
+                "checkout_timeouts": self.timeouts,
+                "overflow_checkouts": self.overflow_checkouts,
+            }
+        state = {"pool_class": type(pool).__name__}
+        if hasattr(pool, "checkedout"):
+            state.update({
+                "size": pool.size(),
+                "in_use": pool.checkedout(),
+                "idle": pool.checkedin(),
+                "overflow": max(pool.overflow(), 0),
+            })
+        return {**state, **counters}
+
+
+def instrumented_pool(base, metrics: PoolMetrics):
+    """Subclass a QueuePool variant so every checkout's wait is recorded in `metrics`.
+
+    The metrics live on the class rather than the instance, so they survive
+    `engine.dispose()` recreating the pool.
+    """
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            conn = base._do_get(self)
+        except exc.TimeoutError:
+            metrics.record_checkout(time.perf_counter() - start, timed_out=True)
+            raise
+        metrics.record_checkout(time.perf_counter() - start, overflow=self.checkedout() > self.size())
+        return conn
+
+    return type(f"Instrumented{base.__name__}", (base,), {"_do_get": _do_get, "metrics": metrics})
@@ -0,0 +1,176 @@
+"""Incrementally maintained per-project task counters.
+
+Every code path that creates, deletes or changes the status of a Task calls
+`record_task_change` (or `apply_deltas`, for a batch) before committing, so
+the `project_stats` row moves in the same transaction as the task itself. Counters are bumped with
+`UPDATE ... SET col = col + n`, so concurrent bumps never overwrite each
+other. The deltas are only right if the old status they are computed from
+is current, so callers read it under a row lock: `access.lock_task` for a
+single task, SELECT ... FOR UPDATE in `crud.apply_task_batch`. SQLite
+ignores FOR UPDATE, so this holds on PostgreSQL only; `repair`
+rewrites counters that drifted.
+
+The row also carries the project's `version`, which goes up on every
+write to the project's tasks, comments, attachments or members (see
+`bump_version`). Read endpoints turn it into an ETag, so clients can
+revalidate a board without the server rebuilding it.
+
+Run `python project_stats.py check` to compare the counters with the tasks
+table, or `python project_stats.py repair` to rewrite any that drifted.
+"""
+import argparse
+from datetime import datetime
+from sqlalchemy import func, case, select
+from sqlalchemy.orm import Session
+import models, crud
+
+# Task.status value -> ProjectStats column
+STATUS_COLUMNS = {
+    "pending": "pending",
+    "in-progress": "in_progress",
+    "done": "done",
+}
+COUNTER_COLUMNS = ("total", "pending", "in_progress", "done")
+
+
+def task_change_deltas(old_status: str = None, new_status: str = None, created: bool = False,
+                       deleted: bool = False, deltas: dict = None) -> dict:
+    """Add one task mutation's counter changes to `deltas` (a new dict if omitted).
+
+    Pass `created=True` with `new_status` for an insert, `deleted=True` with
+    `old_status` for a delete, and both statuses for a status change.
+    """
+    deltas = {} if deltas is None else deltas
+    if created:
+        deltas["total"] = deltas.get("total", 0) + 1
+    if deleted:
+        deltas["total"] = deltas.get("total", 0) - 1
+    if created or deleted or old_status != new_status:
+        if not created and old_status in STATUS_COLUMNS:
+            col = STATUS_COLUMNS[old_status]
+            deltas[col] = deltas.get(col, 0) - 1
+        if not deleted and new_status in STATUS_COLUMNS:
+            col = STATUS_COLUMNS[new_status]
+            deltas[col] = deltas.get(col, 0) + 1
+    return deltas
+
+
+def apply_deltas(db: Session, project_id: int, deltas: dict):
+    """Move the project's counters by `deltas` and bump its version, in a single UPDATE."""
+    # A project without a row (created before the table existed and never
+    # backfilled) is left alone; get_analytics falls back to a live count
+    # for it until `repair` writes the row.
+    table = models.ProjectStats.__table__
+    values = {col: table.c[col] + n for col, n in deltas.items() if n}
+    values["version"] = table.c.version + 1
+    db.execute(table.update().where(table.c.project_id == project_id).values(values))
+
+
+def bump_version(db: Session, project_id: int):
+    """Mark a project as changed by a write that moves no counter."""
+    apply_deltas(db, project_id, {})
+
+
+def bump_versions_for_commenter(db: Session, user_id: int):
+    """A renamed user changes the author shown on every board they commented on."""
+    table = models.ProjectStats.__table__
+    project_ids = (
+        select(models.Task.project_id)
+        .join(models.Comment, models.Comment.task_id == models.Task.id)
+        .where(models.Comment.user_id == user_id)
+    )
+    db.execute(
+        table.update()
+        .where(table.c.project_id.in_(project_ids))
+        .values(version=table.c.version + 1)
+    )
+
+
+def record_task_change(db: Session, project_id: int, old_status: str = None, new_status: str = None,
+                       created: bool = False, deleted: bool = False):
+    """Apply one task mutation to the project's counters (see `task_change_deltas`)."""
+    apply_deltas(db, project_id, task_change_deltas(old_status, new_status, created, deleted))
+
+
+def create_stats_row(db: Session, project_id: int):
+    db.add(models.ProjectStats(project_id=project_id, total=0, pending=0, in_progress=0, done=0, version=1))
+
+
+def compute_stats(db: Session, project_id: int) -> models.ProjectStats:
+    """Recount a project's tasks from scratch (used by the backfill and repair paths)."""
+    columns = [func.count(models.Task.id)]
+    for status, col in STATUS_COLUMNS.items():
+        columns.append(func.count(case((models.Task.status == status, models.Task.id))))
+    row = db.query(*columns).filter(models.Task.project_id == project_id).one()
+    return models.ProjectStats(project_id=project_id, **dict(zip(COUNTER_COLUMNS, row)))
+
+
+def overdue_count_query(project_id: int):
+    # Overdue depends on the current time, so it cannot be kept as a counter.
+    return select(func.count(models.Task.id)).where(
+        models.Task.project_id == project_id,
+        models.Task.due_date < datetime.utcnow(),
+        models.Task.status != "done",
+    )
+
+
+def get_analytics(db: Session, project_id: int) -> dict:
+    stats = db.get(models.ProjectStats, project_id)
+    if stats is None:
+        return crud.get_project_analytics(db, project_id)
+
+    overdue = db.scalar(overdue_count_query(project_id))
+
+    return {
+        "total": stats.total,
+        "pending": stats.pending,
+        "in_progress": stats.in_progress,
+        "done": stats.done,
+        "overdue": overdue,
+    }
+
+
+def check(db: Session, repair: bool = False) -> list:
+    """Return `(project_id, stored, actual)` for every project whose counters drifted."""
+    mismatches = []
+    for (project_id,) in db.query(models.Project.id).order_by(models.Project.id):
+        actual = compute_stats(db, project_id)
+        stored = db.get(models.ProjectStats, project_id)
+        actual_values = {col: getattr(actual, col) for col in COUNTER_COLUMNS}
+        stored_values = {col: getattr(stored, col) for col in COUNTER_COLUMNS} if stored else None
+        if stored_values != actual_values:
+            mismatches.append((project_id, stored_values, actual_values))
+            if repair and stored is None:
+                db.add(actual)
+            elif repair:
+                for col in COUNTER_COLUMNS:
+                    setattr(stored, col, actual_values[col])
+                # Analytics cached against the old version are wrong too
+                stored.version += 1
+    if repair:
+        db.commit()
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check or repair the project_stats counters.")
+    parser.add_argument("command", choices=["check", "repair"])
+    args = parser.parse_args()
+
+    from database import SessionLocal
+    db = SessionLocal()
+    try:
+        mismatches = check(db, repair=args.command == "repair")
+    finally:
+        db.close()
+
+    for project_id, stored, actual in mismatches:
+        print(f"project {project_id}: stored={stored} actual={actual}")
+    verb = "repaired" if args.command == "repair" else "found"
+    print(f"{len(mismatches)} inconsistent project(s) {verb}")
+    if mismatches and args.command == "check":
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+"""Find N+1 query patterns: per-request statement fingerprints and a test helper.
+
+With QUERY_AUDIT enabled (meant for development), every SQL statement a
+request executes is fingerprinted: literals, numbers and IN-lists are
+folded, so the same query for a different row has the same shape. When
+one shape runs more than QUERY_AUDIT_THRESHOLD times in a request, for
+example a lazy `Task.comments` load inside a loop, a warning names the
+route, the statement and the application code that issued it.
+
+Tests can bound the statements an endpoint call may execute:
+
+    from query_audit import assert_max_queries
+
+    with assert_max_queries(4):
+        client.get(f"/projects/{project_id}/tasks", headers=headers)
+"""
+import logging
+import os
+import re
+import sys
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+from threading import Lock
+from sqlalchemy import event
+from metrics import route_template
+
+logger = logging.getLogger(__name__)
+
+QUERY_AUDIT = os.getenv("QUERY_AUDIT", "false").lower() in ("1", "true", "yes")
+# A statement shape repeated more often than this in one request is reported
+QUERY_AUDIT_THRESHOLD = int(os.getenv("QUERY_AUDIT_THRESHOLD", "5"))
+
+APP_ROOT = os.path.dirname(os.path.abspath(__file__))
+# Frames from these files say nothing about where a query came from
+_SKIPPED_FILES = {os.path.join(APP_ROOT, name) for name in ("query_audit.py", "database.py")}
+CALL_SITE_DEPTH = 3
+
+_PLACEHOLDER = r"(?:\?|%\(\w+\)s|%s|\$\d+|:\w+)"
+_IN_LIST = re.compile(rf"\(\s*{_PLACEHOLDER}(?:\s*,\s*{_PLACEHOLDER})+\s*\)")
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"(?<![\w$])\d+(?:\.\d+)?\b")
+_SPACE = re.compile(r"\s+")
+
+_request_log = ContextVar("query_audit_log", default=None)
+
+
+@lru_cache(maxsize=4096)
+def fingerprint(statement: str) -> str:
+    """The statement with literals, numbers and IN-lists replaced, whitespace collapsed."""
+    shape = _IN_LIST.sub("(...)", statement)
+    shape = _STRING.sub("?", shape)
+    shape = _NUMBER.sub("?", shape)
+    return _SPACE.sub(" ", shape).strip()
+
+
+def call_site(depth: int = CALL_SITE_DEPTH) -> list:
+    """The innermost application frames on the current stack, as `file:line in function`."""
+    sites = []
+    frame = sys._getframe(1)
+    while frame is not None and len(sites) < depth:
+        filename = frame.f_code.co_filename
+        if filename.startswith(APP_ROOT) and filename not in _SKIPPED_FILES and "site-packages" not in filename:
+            sites.append(f"{os.path.relpath(filename, APP_ROOT)}:{frame.f_lineno} in {frame.f_code.co_name}")
+        frame = frame.f_back
+    return sites
+
+
+class QueryLog:
+    """Statements seen in one request or one `capture_queries` block, grouped by shape."""
+
+    def __init__(self):
+        self._lock = Lock()
+        self.total = 0
+        self.counts = {}  # fingerprint -> executions
+        self.sites = {}  # fingerprint -> call site of its first execution
+
+    def record(self, statement: str):
+        shape = fingerprint(statement)
+        with self._lock:
+            self.total += 1
+            seen = self.counts.get(shape, 0)
+            self.counts[shape] = seen + 1
+        if not seen:
+            # One stack walk per distinct shape, not per execution
+            self.sites[shape] = call_site()
+
+    def repeated(self, threshold: int) -> list:
+        """`(fingerprint, count, call site)` for shapes run more than `threshold` times, worst first."""
+        with self._lock:
+            counts = sorted(self.counts.items(), key=lambda item: -item[1])
+        return [(shape, count, self.sites.get(shape, [])) for shape, count in counts if count > threshold]
+
+    def summary(self) -> str:
+        with self._lock:
+            counts = sorted(self.counts.items(), key=lambda item: -item[1])
+        lines = []
+        for shape, count in counts:
+            site = self.sites.get(shape)
+            lines.append(f"  {count:4d} x {shape}" + (f"\n         at {' <- '.join(site)}" if site else ""))
+        return "\n".join(lines)
+
+
+def _record(conn, cursor, statement, parameters, context, executemany):
+    log = _request_log.get()
+    if log is not None:
+        log.record(statement)
+
+
+class QueryAuditMiddleware:
+    """Plain ASGI middleware that reports repeated statement shapes per request."""
+
+    def __init__(self, app, threshold: int = QUERY_AUDIT_THRESHOLD):
+        self.app = app
+        self.threshold = threshold
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        log = QueryLog()
+        token = _request_log.set(log)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _request_log.reset(token)
+            self.report(scope, log)
+
+    def report(self, scope, log: QueryLog):
+        repeated = log.repeated(self.threshold)
+        if not repeated:
+            return
+        # Statements awaited straight from an endpoint run on another thread or
+        # greenlet, whose stack has no application frames; name the endpoint instead.
+        endpoint = scope.get("endpoint")
+        fallback = f"{endpoint.__module__}.{endpoint.__qualname__}" if endpoint else "(no application frame)"
+        for shape, count, site in repeated:
+            logger.warning(
+                "Possible N+1 in %s %s: %d executions of one statement (%d statements in total, threshold %d)\n"
+                "  %s\n  at %s",
+                scope["method"], route_template(scope), count, log.total, self.threshold,
+                shape, " <- ".join(site) or fallback,
+            )
+
+
+def install(app, *engines):
+    """Audit every request `app` serves on `engines` (sync Engines)."""
+    app.add_middleware(QueryAuditMiddleware)
+    for engine in engines:
+        event.listen(engine, "before_cursor_execute", _record)
+
+
+# -------------------------------
+# Test helpers
+# -------------------------------
+
+def _app_engines() -> list:
+    import database
+
+    engines = [database.engine]
+    if database.async_engine is not None:
+        engines.append(database.async_engine.sync_engine)
+    return engines
+
+
+@contextmanager
+def capture_queries(*engines):
+    """Record every statement run on `engines` (default: the app's) inside the block.
+
+    Listens on the engines rather than per request, so it also sees the
+    statements of a TestClient call, which runs in another thread.
+    """
+    engines = engines or _app_engines()
+    log = QueryLog()
+
+    def listener(conn, cursor, statement, parameters, context, executemany):
+        log.record(statement)
+
+    for engine in engines:
+        event.listen(engine, "before_cursor_execute", listener)
+    try:
+        yield log
+    finally:
+        for engine in engines:
+            event.remove(engine, "before_cursor_execute", listener)
+
+
+@contextmanager
+def assert_max_queries(limit: int, *engines, repeat_threshold: int = None):
+    """Fail if the block runs more than `limit` statements.
+
+    With `repeat_threshold`, also fail if any one statement shape runs more
+    than that many times, however low the total is.
+    """
+    with capture_queries(*engines) as log:
+        yield log
+    if log.total > limit:
+        raise AssertionError(f"Expected at most {limit} queries, {log.total} were executed:\n{log.summary()}")
+    if repeat_threshold is not None and log.repeated(repeat_threshold):
+        raise AssertionError(
+            f"A statement ran more than {repeat_threshold} times (possible N+1):\n{log.summary()}"
+        )
@@ -0,0 +1,21 @@
+from fastapi import APIRouter, Depends, HTTPException, Header
+import os
+import secrets
+import database
+
+router = APIRouter(prefix="/admin", tags=["Admin"])
+
+# Operational endpoints are disabled unless a token is configured
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+def require_admin(x_admin_token: str = Header(None)):
+    if not ADMIN_TOKEN or not x_admin_token or not secrets.compare_digest(x_admin_token, ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+# 🔌 Live connection pool state for this worker
+@router.get("/db-pool", dependencies=[Depends(require_admin)])
+async def db_pool_status():
+    pools = {"sync": database.sync_pool_metrics.snapshot(database.engine.pool)}
+    if database.async_engine is not None:
+        pools["async"] = database.async_pool_metrics.snapshot(database.async_engine.sync_engine.pool)
+    return {"pid": os.getpid(), "async_mode": database.DB_ASYNC, "pools": pools}
@@ -1,27 +1,26 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from database import get_db
+from fastapi import APIRouter, Depends, Response
+from sqlalchemy import select
+from sqlalchemy.orm import contains_eager
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_async_db
 from auth import get_current_user
-import models, schemas
+from access import require_task, TaskAccess, VIEWER, MEMBER
+import models, schemas, broker, project_stats
 from typing import List
+from pagination import PageParams, NEXT_CURSOR_HEADER, encode_cursor, decode_id_cursor, split_page
 
 router = APIRouter()
 
 # ✅ Add a comment to a task
 @router.post("/tasks/{task_id}/comments", response_model=schemas.CommentOut)
-def add_comment_to_task(
+async def add_comment_to_task(
     task_id: int,
     comment: schemas.CommentCreate,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(get_current_user),
+    access: TaskAccess = Depends(require_task(MEMBER))
 ):
-    task = db.query(models.Task).join(models.Project).filter(
-        models.Task.id == task_id,
-        models.Project.owner_id == current_user.id
-    ).first()
-
-    if not task:
-        raise HTTPException(status_code=404, detail="Task not found or unauthorized")
+    task = access.task
 
     new_comment = models.Comment(
         content=comment.content,
@@ -29,34 +28,40 @@ def add_comment_to_task(
         user_id=current_user.id
     )
     db.add(new_comment)
-    db.commit()
-    db.refresh(new_comment)
+    await db.run_sync(project_stats.bump_version, task.project_id)
+    await db.commit()
+    await db.refresh(new_comment)
 
-    return schemas.CommentOut(
+    comment_out = schemas.CommentOut(
         id=new_comment.id,
         content=new_comment.content,
         timestamp=new_comment.timestamp,
         user_name=current_user.name  # 👈 set commenter name in response
     )
+    await broker.publish(task.project_id, {"type": "comment.created", "task_id": task_id, "comment": comment_out})
+    return comment_out
 
 # ✅ Get all comments for a task
 @router.get("/tasks/{task_id}/comments", response_model=List[schemas.CommentOut])
-def get_comments_for_task(
+async def get_comments_for_task(
     task_id: int,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    response: Response,
+    page: PageParams = Depends(),
+    db: AsyncSession = Depends(get_async_db),
+    access: TaskAccess = Depends(require_task(VIEWER))
 ):
-    task = db.query(models.Task).join(models.Project).filter(
-        models.Task.id == task_id,
-        models.Project.owner_id == current_user.id
-    ).first()
-
-    if not task:
-        raise HTTPException(status_code=404, detail="Task not found or unauthorized")
+    query = select(models.Comment).join(models.User).options(
+        contains_eager(models.Comment.user)
+    ).where(models.Comment.task_id == task_id)
+    if page.after:
+        # Keyset on id alone: ids follow insertion order, and unlike the
+        # timestamp they compare the same way on every backend
+        query = query.where(models.Comment.id > decode_id_cursor(page.after))
+    rows = (await db.scalars(query.order_by(models.Comment.id).limit(page.limit + 1))).all()
 
-    comments = db.query(models.Comment).join(models.User).filter(
-        models.Comment.task_id == task_id
-    ).order_by(models.Comment.timestamp.asc()).all()
+    comments, has_more = split_page(rows, page.limit)
+    if has_more:
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(comments[-1].id)
 
     return [
         schemas.CommentOut(
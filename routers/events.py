@@ -0,0 +1,46 @@
+import asyncio
+import json
+from fastapi import APIRouter, Depends
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_async_db
+from access import require_project, ProjectAccess, VIEWER
+from broker import broker
+
+router = APIRouter()
+
+# Comment lines keep idle connections open through proxies and surface disconnects
+KEEPALIVE_SECONDS = 15
+
+
+def _sse(event: dict) -> str:
+    return f"event: {event['type']}\ndata: {json.dumps(event, separators=(',', ':'))}\n\n"
+
+
+# ✅ Live task board updates (Server-Sent Events)
+@router.get("/projects/{project_id}/events")
+async def stream_project_events(
+    project_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    access: ProjectAccess = Depends(require_project(VIEWER))
+):
+    # The stream outlives this request's session; hand its connection back now
+    await db.close()
+
+    async def stream():
+        async with broker.subscribe(project_id) as queue:
+            # Sent once subscribed: anything loaded after this is not missed
+            yield _sse({"type": "ready"})
+            while True:
+                try:
+                    events = await asyncio.wait_for(queue.get(), KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                for event in events:
+                    yield _sse(event)
+
+    return StreamingResponse(stream(), media_type="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",  # 👈 stop nginx from buffering the stream
+    })
@@ -1,13 +1,16 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
-from database import get_db
+from database import get_async_db
 from models import Project, ProjectMember, User
 from auth import get_current_user
+from access import require_project, ProjectAccess, ADMIN, OWNER, VIEWER, MEMBER, MEMBER_ROLES, invalidate_project_access
 from pydantic import BaseModel
 from auth import SECRET_KEY, ALGORITHM
 from jose import jwt, JWTError
 from datetime import datetime, timedelta
+import project_stats
 
 INVITE_TOKEN_EXPIRE_MINUTES = 60 * 24  # 1 day
 
@@ -34,81 +37,85 @@ class MemberResponse(BaseModel):
     class Config:
         from_attributes = True
 
+def _check_role_change(access: ProjectAccess, new_role: str, current_role: str = None):
+    """Admins manage members up to editor; only the owner grants or revokes admin.
+
+    Only `new_role` has to be a valid role: a legacy or unknown stored role
+    can always be replaced.
+    """
+    if new_role not in MEMBER_ROLES:
+        raise HTTPException(status_code=400, detail=f"Role must be one of: {', '.join(MEMBER_ROLES)}")
+    if ADMIN in (new_role, current_role) and not access.allows(OWNER):
+        raise HTTPException(status_code=403, detail="Only the project owner can manage admins")
+
 # ➕ Add Member to Project
 @router.post("/{project_id}/members", response_model=MemberResponse)
-def add_member(project_id: int, data: MemberAddRequest, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    project = db.query(Project).filter(Project.id == project_id, Project.owner_id == current_user.id).first()
-    if not project:
-        raise HTTPException(status_code=403, detail="You do not own this project")
+async def add_member(project_id: int, data: MemberAddRequest, db: AsyncSession = Depends(get_async_db), access: ProjectAccess = Depends(require_project(ADMIN))):
+    _check_role_change(access, data.role)
 
-    existing = db.query(ProjectMember).filter_by(project_id=project_id, user_id=data.user_id).first()
+    existing = await db.scalar(select(ProjectMember).filter_by(project_id=project_id, user_id=data.user_id))
     if existing:
         raise HTTPException(status_code=400, detail="User is already a member of this project")
 
-    user = db.query(User).filter_by(id=data.user_id).first()
+    user = await db.scalar(select(User).filter_by(id=data.user_id))
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
+    if await db.scalar(select(Project.id).where(Project.id == project_id, Project.owner_id == data.user_id)):
+        raise HTTPException(status_code=400, detail="The project owner cannot be added as a member")
 
     member = ProjectMember(user_id=data.user_id, project_id=project_id, role=data.role)
     db.add(member)
-    db.commit()
-    db.refresh(member)
+    await db.run_sync(project_stats.bump_version, project_id)
+    await db.commit()
+    await db.refresh(member)
+    invalidate_project_access(project_id, data.user_id)
 
     return MemberResponse(user_id=user.id, name=user.name, email=user.email, role=member.role)
 
 # 📃 Get All Members of a Project
 @router.get("/{project_id}/members", response_model=List[MemberResponse])
-def get_members(project_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    project = db.query(Project).filter(Project.id == project_id).first()
-    if not project:
-        raise HTTPException(status_code=404, detail="Project not found")
-
-    members = (
-        db.query(ProjectMember, User)
+async def get_members(project_id: int, db: AsyncSession = Depends(get_async_db), access: ProjectAccess = Depends(require_project(VIEWER))):
+    members = (await db.execute(
+        select(ProjectMember, User)
         .join(User, ProjectMember.user_id == User.id)
-        .filter(ProjectMember.project_id == project_id)
-        .all()
-    )
+        .where(ProjectMember.project_id == project_id)
+    )).all()
 
     return [MemberResponse(user_id=u.id, name=u.name, email=u.email, role=m.role) for m, u in members]
 
 # 🔁 Update Member Role
 @router.put("/{project_id}/members/{user_id}", response_model=MemberResponse)
-def update_member_role(project_id: int, user_id: int, data: MemberUpdateRequest, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    project = db.query(Project).filter(Project.id == project_id, Project.owner_id == current_user.id).first()
-    if not project:
-        raise HTTPException(status_code=403, detail="You do not own this project")
-
-    member = db.query(ProjectMember).filter_by(project_id=project_id, user_id=user_id).first()
+async def update_member_role(project_id: int, user_id: int, data: MemberUpdateRequest, db: AsyncSession = Depends(get_async_db), access: ProjectAccess = Depends(require_project(ADMIN))):
+    member = await db.scalar(select(ProjectMember).filter_by(project_id=project_id, user_id=user_id))
     if not member:
         raise HTTPException(status_code=404, detail="Member not found")
+    _check_role_change(access, data.role, current_role=member.role)
 
     member.role = data.role
-    db.commit()
+    await db.run_sync(project_stats.bump_version, project_id)
+    await db.commit()
+    invalidate_project_access(project_id, user_id)
 
-    user = db.query(User).filter_by(id=user_id).first()
+    user = await db.scalar(select(User).filter_by(id=user_id))
     return MemberResponse(user_id=user.id, name=user.name, email=user.email, role=member.role)
 
 # ❌ Remove Member
 @router.delete("/{project_id}/members/{user_id}")
-def remove_member(project_id: int, user_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    project = db.query(Project).filter(Project.id == project_id, Project.owner_id == current_user.id).first()
-    if not project:
-        raise HTTPException(status_code=403, detail="You do not own this project")
-
-    member = db.query(ProjectMember).filter_by(project_id=project_id, user_id=user_id).first()
+async def remove_member(project_id: int, user_id: int, db: AsyncSession = Depends(get_async_db), access: ProjectAccess = Depends(require_project(ADMIN))):
+    member = await db.scalar(select(ProjectMember).filter_by(project_id=project_id, user_id=user_id))
     if not member:
         raise HTTPException(status_code=404, detail="Member not found")
+    if member.role == ADMIN and not access.allows(OWNER):
+        raise HTTPException(status_code=403, detail="Only the project owner can manage admins")
 
-    db.delete(member)
-    db.commit()
+    await db.delete(member)
+    await db.run_sync(project_stats.bump_version, project_id)
+    await db.commit()
+    invalidate_project_access(project_id, user_id)
     return {"message": "Member removed"}
 
 @router.get("/{project_id}/invite-link")
-def generate_invite_link(project_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    project = db.query(Project).filter(Project.id == project_id, Project.owner_id == current_user.id).first()
-    if not project:
-        raise HTTPException(status_code=403, detail="You do not own this project")
+async def generate_invite_link(project_id: int, db: AsyncSession = Depends(get_async_db), access: ProjectAccess = Depends(require_project(ADMIN))):
 
     expire = datetime.utcnow() + timedelta(minutes=INVITE_TOKEN_EXPIRE_MINUTES)
     payload = {
@@ -120,25 +127,27 @@ def generate_invite_link(project_id: int, db: Session = Depends(get_db), current
     return {"invite_link": link}
 
 @router.post("/join")
-def join_project_via_token(token: str, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+async def join_project_via_token(token: str, db: AsyncSession = Depends(get_async_db), current_user: User = Depends(get_current_user)):
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         project_id = payload.get("project_id")
     except JWTError:
         raise HTTPException(status_code=400, detail="Invalid or expired invite token")
 
-    project = db.query(Project).filter_by(id=project_id).first()
+    project = await db.scalar(select(Project).filter_by(id=project_id))
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
 
     # Check if already a member
-    existing = db.query(ProjectMember).filter_by(project_id=project_id, user_id=current_user.id).first()
+    existing = await db.scalar(select(ProjectMember).filter_by(project_id=project_id, user_id=current_user.id))
     if existing:
         return {"message": "Already a member of this project"}
 
     # Add user as a "member"
-    member = ProjectMember(user_id=current_user.id, project_id=project_id, role="member")
+    member = ProjectMember(user_id=current_user.id, project_id=project_id, role=MEMBER)
     db.add(member)
-    db.commit()
+    await db.run_sync(project_stats.bump_version, project_id)
+    await db.commit()
+    invalidate_project_access(project_id, current_user.id)
 
     return {"message": f"You have joined the project '{project.title}' successfully!"}
@@ -0,0 +1,29 @@
+from fastapi import APIRouter, Depends, HTTPException, Header
+from fastapi.responses import PlainTextResponse
+import os
+import secrets
+import database, metrics
+from access import access_cache
+from auth import user_cache
+
+router = APIRouter(tags=["Monitoring"])
+
+# Set to require `Authorization: Bearer <token>` (Prometheus' bearer_token) on scrapes
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+def require_metrics_token(authorization: str = Header(None)):
+    if not METRICS_TOKEN:
+        return
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not secrets.compare_digest(token, METRICS_TOKEN):
+        raise HTTPException(status_code=403, detail="Metrics token required")
+
+# 📈 Prometheus scrape endpoint for this worker
+@router.get("/metrics", include_in_schema=False, dependencies=[Depends(require_metrics_token)])
+async def prometheus_metrics():
+    pools = {"sync": database.sync_pool_metrics.snapshot(database.engine.pool)}
+    if database.async_engine is not None:
+        pools["async"] = database.async_pool_metrics.snapshot(database.async_engine.sync_engine.pool)
+    caches = {"users": user_cache.stats(), "project_access": access_cache.stats()}
+    return PlainTextResponse(metrics.render(pools=pools, caches=caches), media_type=PROMETHEUS_CONTENT_TYPE)
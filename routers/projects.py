@@ -1,27 +1,37 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
-from sqlalchemy.orm import Session
-from database import get_db
+from fastapi import APIRouter, Depends, UploadFile, File, Form, Request, Response, Query
+from sqlalchemy import select, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_async_db
 from auth import get_current_user
-import models, schemas
+from access import require_project, require_task, lock_task, check_assignee, ProjectAccess, TaskAccess, VIEWER, EDITOR, invalidate_project_access
+import models, schemas, crud, project_stats, task_history, storage, search, broker, etags
 from typing import List
 from datetime import datetime
-import os
-import shutil
-from fastapi.responses import FileResponse
+from fast_json import json_response
+from fieldsets import TaskListParams
+from pagination import PageParams, NEXT_CURSOR_HEADER, encode_cursor, decode_id_cursor, decode_offset_cursor, split_page
+from task_history import DateRange
 
 router = APIRouter()
 
-UPLOAD_DIR = "uploads"
-os.makedirs(UPLOAD_DIR, exist_ok=True)
+async def _get_project_version(db: AsyncSession, project_id: int, *extra):
+    """The project's version (plus any `extra` columns) for its read ETags.
+
+    `version` is None for a project without a project_stats row, whose reads
+    then go out without an ETag.
+    """
+    return (await db.execute(
+        select(models.ProjectStats.version, *extra).where(models.ProjectStats.project_id == project_id)
+    )).first()
 
 # -------------------------------
 # ✅ Project Endpoints
 # -------------------------------
 
 @router.post("/projects/create", response_model=schemas.ProjectOut)
-def create_project(
+async def create_project(
     project: schemas.ProjectCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: models.User = Depends(get_current_user)
 ):
     new_project = models.Project(
@@ -30,39 +40,59 @@ def create_project(
         owner_id=current_user.id
     )
     db.add(new_project)
-    db.commit()
-    db.refresh(new_project)
+    await db.flush()
+    await db.run_sync(project_stats.create_stats_row, new_project.id)
+    await db.commit()
+    await db.refresh(new_project)
+    invalidate_project_access(new_project.id, current_user.id)
     return new_project
 
 @router.get("/projects", response_model=List[schemas.ProjectOut])
-def get_user_projects(
-    db: Session = Depends(get_db),
+async def get_user_projects(
+    response: Response,
+    page: PageParams = Depends(),
+    db: AsyncSession = Depends(get_async_db),
     current_user: models.User = Depends(get_current_user)
 ):
-    return db.query(models.Project).filter(models.Project.owner_id == current_user.id).all()
+    # Projects the user owns or has been added to
+    member_of = select(models.ProjectMember.project_id).where(models.ProjectMember.user_id == current_user.id)
+    query = select(models.Project).where(or_(
+        models.Project.owner_id == current_user.id,
+        models.Project.id.in_(member_of)
+    ))
+    if page.after:
+        query = query.where(models.Project.id > decode_id_cursor(page.after))
+    rows = (await db.scalars(query.order_by(models.Project.id).limit(page.limit + 1))).all()
+
+    projects, has_more = split_page(rows, page.limit)
+    if has_more:
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(projects[-1].id)
+    return projects
+
+@router.get("/projects/{project_id}", response_model=schemas.ProjectOut)
+async def get_project(
+    project_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    access: ProjectAccess = Depends(require_project(VIEWER))
+):
+    return await db.get(models.Project, project_id)
 
 # -------------------------------
 # ✅ Create Task with File Upload
 # -------------------------------
 
 @router.post("/projects/{project_id}/tasks", response_model=schemas.TaskOut)
-def create_task_for_project(
+async def create_task_for_project(
     project_id: int,
     title: str = Form(...),
     description: str = Form(""),
     status: str = Form("pending"),
     due_date: str = Form(None),
     file: UploadFile = File(None),
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(get_current_user),
+    access: ProjectAccess = Depends(require_project(EDITOR))
 ):
-    project = db.query(models.Project).filter(
-        models.Project.id == project_id,
-        models.Project.owner_id == current_user.id
-    ).first()
-    if not project:
-        raise HTTPException(status_code=404, detail="Project not found or unauthorized")
-
     due = datetime.fromisoformat(due_date) if due_date else None
 
     new_task = models.Task(
@@ -73,87 +103,112 @@ def create_task_for_project(
         project_id=project_id
     )
     db.add(new_task)
-    db.commit()
-    db.refresh(new_task)
+    await db.flush()
+    await db.run_sync(project_stats.record_task_change, project_id, new_status=new_task.status, created=True)
+    await db.run_sync(task_history.record, project_id,
+                      task_history.created(new_task.id, new_task.status, due_date=new_task.due_date), current_user.id)
 
     if file:
-        filepath = os.path.join(UPLOAD_DIR, file.filename)
-        with open(filepath, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        filepath, content_hash, size = await storage.save_upload(file)
         attachment = models.FileAttachment(
             filename=file.filename,
             filepath=filepath,
+            content_hash=content_hash,
+            size=size,
             task_id=new_task.id
         )
         db.add(attachment)
-        db.commit()
 
-    db.refresh(new_task)
-    return new_task
+    await db.commit()
+    task_out = crud.task_to_out(await db.run_sync(crud.get_task, new_task.id))
+    await broker.publish(project_id, {"type": "task.created", "task": task_out})
+    return task_out
 
 # -------------------------------
-# ✅ Get All Tasks (with Comments + Attachments)
+# ✅ Batch Create / Update / Delete
 # -------------------------------
 
-@router.get("/projects/{project_id}/tasks", response_model=List[schemas.TaskOut])
-def get_tasks_for_project(
+def _batch_events(ops, results) -> list:
+    events = []
+    for op, result in zip(ops, results):
+        if not result["ok"]:
+            continue
+        if op.op == "delete":
+            events.append({"type": "task.deleted", "task_id": result["id"]})
+            continue
+        fields = op.model_dump(include=set(crud.BATCH_UPDATE_FIELDS), exclude_none=True)
+        if op.op == "create":
+            task = schemas.TaskOut(id=result["id"], **{"description": None, "due_date": None, **fields, "status": op.status or "pending"})
+            events.append({"type": "task.created", "task": task})
+        elif fields:
+            events.append({"type": "task.updated", "task": {"id": result["id"], **fields}})
+    return events
+
+@router.post("/projects/{project_id}/tasks/batch", response_model=schemas.TaskBatchOut)
+async def batch_tasks_for_project(
     project_id: int,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    batch: schemas.TaskBatch,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(get_current_user),
+    access: ProjectAccess = Depends(require_project(EDITOR))
 ):
-    project = db.query(models.Project).filter(
-        models.Project.id == project_id,
-        models.Project.owner_id == current_user.id
-    ).first()
-    if not project:
-        raise HTTPException(status_code=404, detail="Project not found or unauthorized")
-
-    tasks = db.query(models.Task).filter(models.Task.project_id == project_id).all()
-
-    return [
-        schemas.TaskOut(
-            id=t.id,
-            title=t.title,
-            description=t.description,
-            status=t.status,
-            due_date=t.due_date,
-            attachments=[
-                schemas.AttachmentOut(
-                    id=a.id,
-                    filename=a.filename,
-                    filepath=a.filepath
-                ) for a in t.attachments
-            ],
-            comments=[
-                schemas.CommentOut(
-                    id=c.id,
-                    content=c.content,
-                    timestamp=c.timestamp,
-                    user_name=c.user.name
-                ) for c in t.comments
-            ]
-        )
-        for t in tasks
-    ]
+    results, deltas, history = await db.run_sync(crud.apply_task_batch, project_id, batch.ops)
+    await db.run_sync(project_stats.apply_deltas, project_id, deltas)
+    await db.run_sync(task_history.record, project_id, history, current_user.id)
+    await db.commit()
+    await broker.publish(project_id, *_batch_events(batch.ops, results))
+    return {"results": results}
+
+# -------------------------------
+# ✅ Get All Tasks (counts by default, Comments + Attachments with include=)
+# -------------------------------
+
+@router.get("/projects/{project_id}/tasks", response_model=List[schemas.TaskListItem])
+async def get_tasks_for_project(
+    project_id: int,
+    request: Request,
+    response: Response,
+    page: PageParams = Depends(),
+    listing: TaskListParams = Depends(),
+    db: AsyncSession = Depends(get_async_db),
+    access: ProjectAccess = Depends(require_project(VIEWER))
+):
+    # Read the version before the tasks: a write in between leaves the ETag
+    # older than the body, which only costs the client one extra full fetch.
+    project = await _get_project_version(db, project_id)
+    if project and project.version is not None:
+        unchanged = etags.not_modified(request, response, etags.weak_etag(project_id, project.version))
+        if unchanged:
+            return unchanged
+
+    after_id = decode_id_cursor(page.after) if page.after else None
+    rows = await db.run_sync(
+        crud.get_project_task_rows, project_id, limit=page.limit + 1, after_id=after_id,
+        fields=listing.fields, include=listing.include,
+    )
+
+    tasks, has_more = split_page(rows, page.limit)
+    if has_more:
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(tasks[-1]["id"])
+    # Rows are already shaped like TaskListItem: encode them once, without revalidating
+    return json_response(tasks, response)
 
 # -------------------------------
 # ✅ Task Edit / Delete
 # -------------------------------
 
 @router.patch("/tasks/{task_id}", response_model=schemas.TaskOut)
-def update_task(
+async def update_task(
     task_id: int,
     task_update: schemas.TaskUpdate,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(get_current_user),
+    access: TaskAccess = Depends(require_task(EDITOR))
 ):
-    task = db.query(models.Task).join(models.Project).filter(
-        models.Task.id == task_id,
-        models.Project.owner_id == current_user.id
-    ).first()
-    if not task:
-        raise HTTPException(status_code=404, detail="Task not found or unauthorized")
-
+    task = access.task
+    await lock_task(db, task)
+    before = task_history.snapshot(task)
     if task_update.title is not None:
         task.title = task_update.title
     if task_update.description is not None:
@@ -162,26 +217,35 @@ def update_task(
         task.status = task_update.status
     if task_update.due_date is not None:
         task.due_date = task_update.due_date
+    if "assignee_id" in task_update.model_fields_set:
+        if task_update.assignee_id is not None:
+            await check_assignee(db, request, task_update.assignee_id, task.project_id)
+        task.assignee_id = task_update.assignee_id
 
-    db.commit()
-    db.refresh(task)
-    return task
+    # Also bumps the project version when only other fields changed
+    await db.run_sync(project_stats.record_task_change, task.project_id, old_status=before["status"], new_status=task.status)
+    await db.run_sync(task_history.record, task.project_id,
+                      task_history.changed(task.id, before, task_history.snapshot(task)), current_user.id)
+    await db.commit()
+    task_out = crud.task_to_out(await db.run_sync(crud.get_task, task.id))
+    await broker.publish(task.project_id, {"type": "task.updated", "task": task_out})
+    return task_out
 
 @router.delete("/tasks/{task_id}")
-def delete_task(
+async def delete_task(
     task_id: int,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(get_current_user),
+    access: TaskAccess = Depends(require_task(EDITOR))
 ):
-    task = db.query(models.Task).join(models.Project).filter(
-        models.Task.id == task_id,
-        models.Project.owner_id == current_user.id
-    ).first()
-    if not task:
-        raise HTTPException(status_code=404, detail="Task not found or unauthorized")
-
-    db.delete(task)
-    db.commit()
+    task = access.task
+    await lock_task(db, task)
+
+    await db.run_sync(project_stats.record_task_change, task.project_id, old_status=task.status, deleted=True)
+    await db.run_sync(task_history.record, task.project_id, task_history.deleted(task.id, task.status), current_user.id)
+    await db.delete(task)
+    await db.commit()
+    await broker.publish(task.project_id, {"type": "task.deleted", "task_id": task_id})
     return {"message": f"Task {task_id} deleted successfully"}
 
 # -------------------------------
@@ -189,32 +253,85 @@ def delete_task(
 # -------------------------------
 
 @router.get("/projects/{project_id}/analytics")
-def get_project_analytics(
+async def get_project_analytics(
     project_id: int,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_async_db),
+    access: ProjectAccess = Depends(require_project(VIEWER))
+):
+    # Overdue changes with the clock rather than with writes, so it is part of the ETag
+    overdue = project_stats.overdue_count_query(project_id).scalar_subquery()
+    project = await _get_project_version(db, project_id, overdue.label("overdue"))
+    if project and project.version is not None:
+        unchanged = etags.not_modified(request, response, etags.weak_etag(project_id, project.version, project.overdue))
+        if unchanged:
+            return unchanged
+
+    return await db.run_sync(project_stats.get_analytics, project_id)
+
+async def _task_history_report(report, project_id: int, span: DateRange, request: Request, response: Response, db: AsyncSession):
+    # Rollups only change with the project's writes, which bump its version
+    project = await _get_project_version(db, project_id)
+    if project and project.version is not None:
+        etag = etags.weak_etag(project_id, project.version, span.start, span.end)
+        unchanged = etags.not_modified(request, response, etag)
+        if unchanged:
+            return unchanged
+
+    return await db.run_sync(report, project_id, span)
+
+@router.get("/projects/{project_id}/analytics/burndown", response_model=schemas.Burndown)
+async def get_project_burndown(
+    project_id: int,
+    request: Request,
+    response: Response,
+    span: DateRange = Depends(),
+    db: AsyncSession = Depends(get_async_db),
+    access: ProjectAccess = Depends(require_project(VIEWER))
+):
+    return await _task_history_report(task_history.burndown, project_id, span, request, response, db)
+
+@router.get("/projects/{project_id}/analytics/throughput", response_model=schemas.Throughput)
+async def get_project_throughput(
+    project_id: int,
+    request: Request,
+    response: Response,
+    span: DateRange = Depends(),
+    db: AsyncSession = Depends(get_async_db),
+    access: ProjectAccess = Depends(require_project(VIEWER))
 ):
-    project = db.query(models.Project).filter(
-        models.Project.id == project_id,
-        models.Project.owner_id == current_user.id
-    ).first()
-    if not project:
-        raise HTTPException(status_code=404, detail="Project not found or unauthorized")
-
-    tasks = db.query(models.Task).filter(models.Task.project_id == project_id).all()
-
-    total_tasks = len(tasks)
-    pending = sum(1 for t in tasks if t.status == "pending")
-    in_progress = sum(1 for t in tasks if t.status == "in-progress")
-    done = sum(1 for t in tasks if t.status == "done")
-
-    now = datetime.utcnow()
-    overdue = sum(1 for t in tasks if t.due_date and t.due_date < now and t.status != "done")
-
-    return {
-        "total": total_tasks,
-        "pending": pending,
-        "in_progress": in_progress,
-        "done": done,
-        "overdue": overdue
-    }
+    return await _task_history_report(task_history.throughput, project_id, span, request, response, db)
+
+@router.get("/projects/{project_id}/analytics/cycle-time", response_model=schemas.CycleTime)
+async def get_project_cycle_time(
+    project_id: int,
+    request: Request,
+    response: Response,
+    span: DateRange = Depends(),
+    db: AsyncSession = Depends(get_async_db),
+    access: ProjectAccess = Depends(require_project(VIEWER))
+):
+    return await _task_history_report(task_history.cycle_time, project_id, span, request, response, db)
+
+# -------------------------------
+# ✅ Search
+# -------------------------------
+
+@router.get("/projects/{project_id}/search", response_model=List[schemas.SearchHit])
+async def search_project(
+    project_id: int,
+    response: Response,
+    q: str = Query(..., min_length=1, max_length=200),
+    page: PageParams = Depends(),
+    db: AsyncSession = Depends(get_async_db),
+    access: ProjectAccess = Depends(require_project(VIEWER))
+):
+    # Hits are ordered by rank, which has no stable keyset, so the cursor is an offset
+    offset = decode_offset_cursor(page.after) if page.after else 0
+    rows = await db.run_sync(search.search_project, project_id, q, page.limit + 1, offset)
+
+    hits, has_more = split_page(rows, page.limit)
+    if has_more:
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(offset + page.limit)
+    return hits
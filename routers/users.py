@@ -1,14 +1,15 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-import models, schemas, utils
-from auth import create_access_token, get_current_user
-from database import get_db
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+import models, schemas, utils, project_stats
+from auth import create_access_token, get_current_user, invalidate_cached_user
+from database import get_async_db
 
 router = APIRouter()
 
 @router.post("/signup")
-def signup(user: schemas.UserCreate, db: Session = Depends(get_db)):
-    existing_user = db.query(models.User).filter(models.User.email == user.email).first()
+async def signup(user: schemas.UserCreate, db: AsyncSession = Depends(get_async_db)):
+    existing_user = await db.scalar(select(models.User).where(models.User.email == user.email))
     if existing_user:
         raise HTTPException(status_code=400, detail="Email already registered")
 
@@ -24,11 +25,11 @@ def signup(user: schemas.UserCreate, db: Session = Depends(get_db)):
     if not any(c in "!@#$%^&*()-_+=" for c in user.password):
         raise HTTPException(status_code=400, detail="Password must include a special character (!@#$...)")
 
-    hashed_password = utils.hash_password(user.password)
+    hashed_password = await utils.hash_password_async(user.password)
     new_user = models.User(name=user.name, email=user.email, password=hashed_password)
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()
+    await db.refresh(new_user)
 
     # ✅ Auto-login after signup
     token = create_access_token(data={"user_id": new_user.id})
@@ -36,17 +37,27 @@ def signup(user: schemas.UserCreate, db: Session = Depends(get_db)):
 
 
 @router.post("/login")
-def login(user: schemas.UserLogin, db: Session = Depends(get_db)):
-    db_user = db.query(models.User).filter(models.User.email == user.email).first()
-    if not db_user or not utils.verify_password(user.password, db_user.password):
+async def login(user: schemas.UserLogin, db: AsyncSession = Depends(get_async_db)):
+    db_user = await db.scalar(select(models.User).where(models.User.email == user.email))
+    if not db_user:
         raise HTTPException(status_code=401, detail="Invalid credentials")
 
+    valid, new_hash = await utils.verify_and_update_password_async(user.password, db_user.password)
+    if not valid:
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+
+    # ✅ Transparently upgrade hashes made with an old bcrypt cost
+    if new_hash:
+        db_user.password = new_hash
+        await db.commit()
+        invalidate_cached_user(db_user.id)
+
     token = create_access_token(data={"user_id": db_user.id})
     return {"access_token": token, "token_type": "bearer"}
 
 
 @router.get("/me")
-def get_me(current_user: models.User = Depends(get_current_user)):
+async def get_me(current_user: models.User = Depends(get_current_user)):
     return {
         "id": current_user.id,
         "email": current_user.email,
@@ -54,11 +65,11 @@ def get_me(current_user: models.User = Depends(get_current_user)):
     }
 
 @router.post("/reset-password")
-def reset_password(
+async def reset_password(
     data: schemas.PasswordReset,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    user = db.query(models.User).filter(models.User.email == data.email).first()
+    user = await db.scalar(select(models.User).where(models.User.email == data.email))
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
@@ -74,31 +85,35 @@ def reset_password(
     if not any(c in "!@#$%^&*()-_+=" for c in data.new_password):
         raise HTTPException(status_code=400, detail="Password must include a special character (!@#$...)")
 
-    user.password = utils.hash_password(data.new_password)
-    db.commit()
+    user.password = await utils.hash_password_async(data.new_password)
+    await db.commit()
+    invalidate_cached_user(user.id)
 
     return {"message": "Password reset successfully"}
 
 
 @router.put("/me/update")
-def update_profile(
+async def update_profile(
     updates: schemas.UserUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: models.User = Depends(get_current_user)
 ):
-    if updates.name:
+    if updates.name and updates.name != current_user.name:
         current_user.name = updates.name
+        # Boards show commenters by name
+        await db.run_sync(project_stats.bump_versions_for_commenter, current_user.id)
 
     if updates.email:
         # Check for conflict
-        if db.query(models.User).filter(models.User.email == updates.email, models.User.id != current_user.id).first():
+        if await db.scalar(select(models.User).where(models.User.email == updates.email, models.User.id != current_user.id)):
             raise HTTPException(status_code=400, detail="Email already in use")
         current_user.email = updates.email
 
     if updates.new_password:
-        if not updates.current_password or not utils.verify_password(updates.current_password, current_user.password):
+        if not updates.current_password or not await utils.verify_password_async(updates.current_password, current_user.password):
             raise HTTPException(status_code=403, detail="Current password is incorrect")
-        current_user.password = utils.hash_password(updates.new_password)
+        current_user.password = await utils.hash_password_async(updates.new_password)
 
-    db.commit()
+    await db.commit()
+    invalidate_cached_user(current_user.id)
     return {"message": "Profile updated successfully"}
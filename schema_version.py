@@ -0,0 +1,150 @@
+"""Check at startup that the database is at the Alembic head revision.
+
+Migrations own the schema (`alembic upgrade head`), so the app neither
+creates nor reflects tables. Each worker reads the one-row alembic_version
+table once, from its lifespan hook, and compares it with the heads in
+alembic/versions. A database that is behind the code, or ahead of it after
+a rollback, stops the worker with a message instead of failing on the first
+request that touches a missing column.
+
+The database may still be starting when the workers are (a fresh compose
+stack, a failover), so connection errors are retried with exponential
+backoff before startup gives up.
+"""
+import ast
+import asyncio
+import logging
+import os
+from functools import lru_cache
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import InterfaceError, OperationalError
+
+logger = logging.getLogger(__name__)
+
+# Skip the check (tests that build their schema with create_all)
+DB_SCHEMA_CHECK = os.getenv("DB_SCHEMA_CHECK", "true").lower() in ("1", "true", "yes")
+# Connection attempts after the first, waiting BACKOFF, 2 * BACKOFF, ... (at most BACKOFF_MAX) between them
+DB_STARTUP_RETRIES = int(os.getenv("DB_STARTUP_RETRIES", "5"))
+DB_STARTUP_BACKOFF = float(os.getenv("DB_STARTUP_BACKOFF", "0.5"))
+DB_STARTUP_BACKOFF_MAX = float(os.getenv("DB_STARTUP_BACKOFF_MAX", "8"))
+
+APP_ROOT = os.path.dirname(os.path.abspath(__file__))
+ALEMBIC_INI = os.path.join(APP_ROOT, "alembic.ini")
+VERSIONS_DIR = os.path.join(APP_ROOT, "alembic", "versions")
+VERSION_TABLE = "alembic_version"
+# The revision whose schema the old `create_all` at import built (ProjectMember,
+# tasks.assignee_id); such a database is stamped there, then upgraded
+LEGACY_CREATE_ALL_REVISION = "1ca747acd688"
+
+# Failures worth waiting out: the server is down, starting or unreachable
+_CONNECTION_ERRORS = (OperationalError, InterfaceError, OSError)
+
+
+class SchemaMismatch(RuntimeError):
+    pass
+
+
+def _module_constants(path: str, names: tuple) -> dict:
+    constants = {}
+    with open(path, encoding="utf-8") as f:
+        tree = ast.parse(f.read(), path)
+    for node in tree.body:
+        if isinstance(node, ast.AnnAssign) and isinstance(node.target, ast.Name):
+            target, value = node.target.id, node.value
+        elif isinstance(node, ast.Assign) and len(node.targets) == 1 and isinstance(node.targets[0], ast.Name):
+            target, value = node.targets[0].id, node.value
+        else:
+            continue
+        if target in names:
+            constants[target] = ast.literal_eval(value)
+    return constants
+
+
+@lru_cache(maxsize=1)
+def expected_heads() -> frozenset:
+    """Head revisions of the migration scripts shipped with this code.
+
+    Read from the scripts' `revision` and `down_revision` constants rather than
+    through alembic's ScriptDirectory: importing alembic costs each worker
+    about as much as everything else this check does.
+    """
+    revisions, parents = set(), set()
+    for name in os.listdir(VERSIONS_DIR):
+        if not name.endswith(".py"):
+            continue
+        constants = _module_constants(os.path.join(VERSIONS_DIR, name), ("revision", "down_revision"))
+        if "revision" not in constants:
+            continue
+        revisions.add(constants["revision"])
+        down = constants.get("down_revision")
+        parents.update(down if isinstance(down, (tuple, list)) else [down] if down else [])
+    return frozenset(revisions - parents)
+
+
+def current_heads(connection) -> frozenset:
+    """Revisions recorded in the database's alembic_version table (empty without one)."""
+    if not inspect(connection).has_table(VERSION_TABLE):
+        return frozenset()
+    return frozenset(connection.execute(text(f"SELECT version_num FROM {VERSION_TABLE}")).scalars())
+
+
+def check_heads(current: frozenset, expected: frozenset = None):
+    expected = expected_heads() if expected is None else expected
+    if current == expected:
+        return
+    if not current:
+        raise SchemaMismatch(
+            "The database has no Alembic revision. Run `alembic upgrade head` (or, if its tables "
+            f"were created by an older release, `alembic stamp {LEGACY_CREATE_ALL_REVISION} && alembic upgrade head`)."
+        )
+    raise SchemaMismatch(
+        f"The database is at revision {', '.join(sorted(current))}, this code expects "
+        f"{', '.join(sorted(expected))}. Run `alembic upgrade head` before starting the app."
+    )
+
+
+async def _read_heads(engine, async_engine) -> frozenset:
+    # Through the engine that serves requests, so its pool opens its first connection here
+    if async_engine is not None:
+        async with async_engine.connect() as conn:
+            return await conn.run_sync(current_heads)
+
+    def read():
+        with engine.connect() as conn:
+            return current_heads(conn)
+
+    return await run_in_threadpool(read)
+
+
+async def verify_schema(engine, async_engine=None, retries: int = DB_STARTUP_RETRIES, backoff: float = DB_STARTUP_BACKOFF):
+    """Wait for the database, then raise SchemaMismatch unless it is at the head revision."""
+    if not DB_SCHEMA_CHECK:
+        return
+    expected = expected_heads()
+    delay = backoff
+    for attempt in range(retries + 1):
+        try:
+            current = await _read_heads(engine, async_engine)
+            break
+        except _CONNECTION_ERRORS as exc:
+            if attempt == retries:
+                raise
+            logger.warning("Database not reachable (%s); retrying in %.1fs (%d/%d)",
+                           exc.__class__.__name__, delay, attempt + 1, retries)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, DB_STARTUP_BACKOFF_MAX)
+    check_heads(current, expected)
+
+
+def upgrade_head(engine):
+    """Run `alembic upgrade head` on `engine`, for scripts that build a database themselves."""
+    from alembic import command
+    from alembic.config import Config
+
+    config = Config(ALEMBIC_INI)
+    # Not engine.begin(): the migrations manage their own transactions (and
+    # leave them for CREATE INDEX CONCURRENTLY)
+    with engine.connect() as connection:
+        config.attributes["connection"] = connection
+        command.upgrade(config, "head")
@@ -1,6 +1,6 @@
-from pydantic import BaseModel, EmailStr, ConfigDict
-from typing import List, Optional
-from datetime import datetime
+from pydantic import BaseModel, EmailStr, ConfigDict, Field
+from typing import List, Optional, Literal
+from datetime import datetime, date
 
 # -------------------------------
 # ✅ User Schemas
@@ -66,6 +66,7 @@ class TaskUpdate(BaseModel):
     description: Optional[str] = None
     status: Optional[str] = None
     due_date: Optional[datetime] = None
+    assignee_id: Optional[int] = None  # 👈 unlike the other fields, an explicit null unassigns
 
 class TaskOut(BaseModel):
     id: int
@@ -73,11 +74,105 @@ class TaskOut(BaseModel):
     description: Optional[str]
     status: str
     due_date: Optional[datetime]
+    assignee_id: Optional[int] = None
     attachments: List[AttachmentOut] = []
     comments: List[CommentOut] = []  # ✅ Include comments with user_name
 
     model_config = ConfigDict(from_attributes=True)
 
+class TaskListItem(BaseModel):
+    # 👈 Board listing: only the fields asked for with `fields=`, lists only with `include=`
+    id: int
+    title: Optional[str] = None
+    description: Optional[str] = None
+    status: Optional[str] = None
+    due_date: Optional[datetime] = None
+    assignee_id: Optional[int] = None
+    comment_count: Optional[int] = None
+    attachment_count: Optional[int] = None
+    attachments: Optional[List[AttachmentOut]] = None
+    comments: Optional[List[CommentOut]] = None
+
+# -------------------------------
+# ✅ Batch Task Schemas
+# -------------------------------
+MAX_BATCH_OPS = 500
+
+class TaskBatchOp(BaseModel):
+    op: Literal["create", "update", "delete"]
+    id: Optional[int] = None  # 👈 required for update / delete
+    title: Optional[str] = None  # 👈 required for create
+    description: Optional[str] = None
+    status: Optional[str] = None
+    due_date: Optional[datetime] = None
+
+class TaskBatch(BaseModel):
+    ops: List[TaskBatchOp] = Field(..., min_length=1, max_length=MAX_BATCH_OPS)
+
+class TaskBatchResult(BaseModel):
+    index: int  # 👈 position of the op in the request
+    op: str
+    id: Optional[int] = None
+    ok: bool
+    error: Optional[str] = None
+
+class TaskBatchOut(BaseModel):
+    results: List[TaskBatchResult]
+
+# -------------------------------
+# ✅ Search Schemas
+# -------------------------------
+class SearchHit(BaseModel):
+    kind: Literal["task", "comment"]
+    task_id: int
+    comment_id: Optional[int] = None
+    task_title: str
+    snippet: str  # 👈 matched terms wrapped in <mark></mark>, otherwise raw text
+    rank: float
+
+# -------------------------------
+# ✅ Task History Schemas
+# -------------------------------
+class BurndownDay(BaseModel):
+    date: date
+    open: Optional[int]  # 👈 at the end of the day; null before the project's history begins
+    total: Optional[int]
+    created: int
+    completed: int
+
+class Burndown(BaseModel):
+    start: date
+    end: date
+    days: List[BurndownDay]
+
+class ThroughputDay(BaseModel):
+    date: date
+    created: int
+    completed: int
+    reopened: int
+    deleted: int
+
+class Throughput(BaseModel):
+    start: date
+    end: date
+    created: int
+    completed: int
+    days: List[ThroughputDay]
+
+class CycleTimeDay(BaseModel):
+    date: date
+    completed: int
+    avg_cycle_hours: Optional[float]  # 👈 first move to in-progress -> done
+    avg_lead_hours: Optional[float]  # 👈 created -> done
+
+class CycleTime(BaseModel):
+    start: date
+    end: date
+    completed: int
+    avg_cycle_hours: Optional[float]
+    avg_lead_hours: Optional[float]
+    days: List[CycleTimeDay]
+
 class PasswordReset(BaseModel):
     email: EmailStr
     new_password: str
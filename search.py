@@ -0,0 +1,157 @@
+"""Full-text search over a project's tasks and comments.
+
+On Postgres, `tasks.search_vector` and `comments.search_vector` are
+generated tsvector columns with GIN indexes, so the database keeps them
+current on every INSERT and UPDATE. Task titles are weighted above
+descriptions. On SQLite, FTS5 external-content tables kept in step by
+triggers stand in for them, so search works locally without Postgres.
+
+The columns are not mapped in models.py, because the SQLite schema could
+not create them. Alembic revision e5f1a7c2d9b4 adds them to existing
+databases; `create_all` adds them to new ones through the DDL listeners
+below.
+"""
+import re
+from fastapi import HTTPException
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+import models
+
+SEARCH_CONFIG = "english"
+SNIPPET_WORDS = 16
+HIGHLIGHT_START, HIGHLIGHT_STOP = "<mark>", "</mark>"
+
+# The one definition of the search schema: the DDL listeners below and
+# Alembic revision e5f1a7c2d9b4 both build it from these. Changing them does
+# not alter existing databases; that takes a new revision.
+
+# Postgres: generated tsvector columns, maintained by the database on write
+POSTGRES_SEARCH_VECTORS = {
+    "tasks": f"""setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(title, '')), 'A') ||
+                setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(description, '')), 'B')""",
+    "comments": f"to_tsvector('{SEARCH_CONFIG}', coalesce(content, ''))",
+}
+
+# SQLite: FTS5 external-content tables, maintained by triggers
+SQLITE_FTS_COLUMNS = {
+    "tasks": ["title", "description"],
+    "comments": ["content"],
+}
+
+
+def search_vector_ddl(table: str) -> str:
+    return (
+        f"ALTER TABLE {table} ADD COLUMN search_vector tsvector "
+        f"GENERATED ALWAYS AS ({POSTGRES_SEARCH_VECTORS[table]}) STORED"
+    )
+
+
+def search_vector_index_name(table: str) -> str:
+    return f"ix_{table}_search_vector"
+
+
+def fts_ddl(table: str) -> list:
+    """The FTS5 table over `table` and the triggers that keep it in step."""
+    columns = SQLITE_FTS_COLUMNS[table]
+    fts, cols = f"{table}_fts", ", ".join(columns)
+    new = ", ".join(f"new.{c}" for c in columns)
+    old = ", ".join(f"old.{c}" for c in columns)
+    return [
+        f"CREATE VIRTUAL TABLE {fts} USING fts5({cols}, content='{table}', content_rowid='id')",
+        f"""CREATE TRIGGER {fts}_ai AFTER INSERT ON {table} BEGIN
+            INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new});
+        END""",
+        f"""CREATE TRIGGER {fts}_ad AFTER DELETE ON {table} BEGIN
+            INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old});
+        END""",
+        f"""CREATE TRIGGER {fts}_au AFTER UPDATE OF {cols} ON {table} BEGIN
+            INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old});
+            INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new});
+        END""",
+    ]
+
+
+def _install(table, connection, **kw):
+    dialect = connection.dialect.name
+    if dialect == "postgresql" and table.name in POSTGRES_SEARCH_VECTORS:
+        statements = [
+            search_vector_ddl(table.name),
+            f"CREATE INDEX {search_vector_index_name(table.name)} ON {table.name} USING gin (search_vector)",
+        ]
+    elif dialect == "sqlite" and table.name in SQLITE_FTS_COLUMNS:
+        statements = fts_ddl(table.name)
+    else:
+        statements = []
+    for statement in statements:
+        connection.exec_driver_sql(statement)
+
+
+for _model in (models.Task, models.Comment):
+    event.listen(_model.__table__, "after_create", _install)
+
+
+# The outer query only computes headlines for the page it returns
+_POSTGRES_SEARCH = text(f"""
+    WITH q AS (SELECT websearch_to_tsquery('{SEARCH_CONFIG}', :q) AS query),
+    hits AS (
+        SELECT 'task' AS kind, t.id AS task_id, NULL AS comment_id, ts_rank_cd(t.search_vector, q.query) AS rank
+        FROM tasks t, q
+        WHERE t.project_id = :project_id AND t.search_vector @@ q.query
+        UNION ALL
+        SELECT 'comment', c.task_id, c.id, ts_rank_cd(c.search_vector, q.query)
+        FROM comments c JOIN tasks t ON t.id = c.task_id, q
+        WHERE t.project_id = :project_id AND c.search_vector @@ q.query
+        ORDER BY rank DESC, task_id, comment_id NULLS FIRST
+        LIMIT :limit OFFSET :offset
+    )
+    SELECT h.kind, h.task_id, h.comment_id, t.title AS task_title, h.rank,
+           ts_headline('{SEARCH_CONFIG}',
+                       coalesce(c.content, concat_ws(' ', t.title, t.description)),
+                       q.query,
+                       'StartSel={HIGHLIGHT_START}, StopSel={HIGHLIGHT_STOP}, MaxWords={SNIPPET_WORDS}, MinWords=5, MaxFragments=1'
+           ) AS snippet
+    FROM hits h JOIN tasks t ON t.id = h.task_id LEFT JOIN comments c ON c.id = h.comment_id, q
+    ORDER BY h.rank DESC, h.task_id, h.comment_id NULLS FIRST
+""")
+
+# bm25() is lower-is-better, so it is negated into a rank
+_SQLITE_SEARCH = text(f"""
+    SELECT * FROM (
+        SELECT 'task' AS kind, t.id AS task_id, NULL AS comment_id, t.title AS task_title,
+               -bm25(tasks_fts, 2.0, 1.0) AS rank,
+               snippet(tasks_fts, -1, '{HIGHLIGHT_START}', '{HIGHLIGHT_STOP}', '…', {SNIPPET_WORDS}) AS snippet
+        FROM tasks_fts JOIN tasks t ON t.id = tasks_fts.rowid
+        WHERE tasks_fts MATCH :q AND t.project_id = :project_id
+        UNION ALL
+        SELECT 'comment', t.id, c.id, t.title,
+               -bm25(comments_fts),
+               snippet(comments_fts, 0, '{HIGHLIGHT_START}', '{HIGHLIGHT_STOP}', '…', {SNIPPET_WORDS})
+        FROM comments_fts JOIN comments c ON c.id = comments_fts.rowid JOIN tasks t ON t.id = c.task_id
+        WHERE comments_fts MATCH :q AND t.project_id = :project_id
+    )
+    ORDER BY rank DESC, task_id, comment_id IS NOT NULL, comment_id
+    LIMIT :limit OFFSET :offset
+""")
+
+
+def _fts5_query(q: str) -> str:
+    # Quote every word so user input is never parsed as FTS5 query syntax
+    words = re.findall(r"\w+", q)
+    return " ".join(f'"{w}"' for w in words)
+
+
+def search_project(db: Session, project_id: int, q: str, limit: int, offset: int = 0) -> list:
+    """Ranked task and comment hits for `q` within one project, best first."""
+    dialect = db.get_bind().dialect.name
+    if dialect == "sqlite":
+        q = _fts5_query(q)
+        if not q:
+            return []
+        stmt = _SQLITE_SEARCH
+    elif dialect == "postgresql":
+        stmt = _POSTGRES_SEARCH
+    else:
+        raise HTTPException(status_code=501, detail=f"Full-text search is not available on {dialect}")
+
+    rows = db.execute(stmt, {"q": q, "project_id": project_id, "limit": limit, "offset": offset})
+    return [dict(row._mapping) for row in rows]
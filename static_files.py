@@ -0,0 +1,97 @@
+import json
+import mimetypes
+import os
+from fastapi.responses import FileResponse, Response
+from starlette.datastructures import Headers
+from starlette.staticfiles import StaticFiles
+from build_static import DIST_DIRNAME, MANIFEST_NAME
+
+# Served at stable URLs, so revalidated: a 304 when unchanged
+REVALIDATE_CACHE_CONTROL = "no-cache"
+
+# Preferred in this order when a client accepts several with the same q
+ENCODING_SUFFIXES = {"br": ".br", "gzip": ".gz"}
+
+
+def _encoding_weights(accept_encoding: str) -> dict:
+    """Accept-Encoding as `{coding: q}`; a coding with a malformed q is ignored."""
+    weights = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        param = params.strip().replace(" ", "")
+        if param.startswith("q="):
+            try:
+                q = float(param[2:])
+            except ValueError:
+                continue
+        weights[name] = q
+    return weights
+
+
+def choose_encoding(accept_encoding: str, available) -> str:
+    """The encoding from `available` to send, or None for the uncompressed file.
+
+    A coding the header does not name gets the weight of `*`, if present.
+    An explicitly weighted `identity` wins over codings it outranks.
+    """
+    weights = _encoding_weights(accept_encoding)
+    best, best_q = None, 0
+    for encoding in ENCODING_SUFFIXES:
+        q = weights.get(encoding, weights.get("*", 0))
+        if encoding in available and q > best_q:
+            best, best_q = encoding, q
+    if best_q < weights.get("identity", 0):
+        return None
+    return best
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    """StaticFiles that serves the build_static.py output when it exists.
+
+    Each request gets the brotli or gzip variant its Accept-Encoding allows,
+    read from disk as-is, with no per-request compression, and a strong ETag
+    from the manifest's content hash. Anything missing from the manifest
+    falls back to the plain StaticFiles behaviour.
+    """
+
+    def __init__(self, *, directory: str, **kwargs):
+        super().__init__(directory=directory, **kwargs)
+        self.dist_dir = os.path.join(directory, DIST_DIRNAME)
+        self.manifest = {}
+        manifest_path = os.path.join(self.dist_dir, MANIFEST_NAME)
+        if os.path.exists(manifest_path):
+            with open(manifest_path) as f:
+                self.manifest = json.load(f)
+
+    async def get_response(self, path: str, scope) -> Response:
+        path = path.replace(os.sep, "/")
+        entry = self.manifest.get(path)
+        if entry is None:
+            return await super().get_response(path, scope)
+
+        request_headers = Headers(scope=scope)
+        encoding = choose_encoding(request_headers.get("accept-encoding", ""), entry["encodings"])
+
+        filepath = os.path.join(self.dist_dir, path)
+        # Strong validators must differ between encodings of the same file
+        etag = f'"{entry["hash"]}-{encoding}"' if encoding else f'"{entry["hash"]}"'
+        headers = {
+            "etag": etag,
+            "vary": "Accept-Encoding",
+            "cache-control": REVALIDATE_CACHE_CONTROL,
+        }
+        if encoding:
+            filepath += ENCODING_SUFFIXES[encoding]
+            headers["content-encoding"] = encoding
+
+        if_none_match = request_headers.get("if-none-match")
+        if if_none_match and etag in [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]:
+            return Response(status_code=304, headers=headers)
+
+        # Content-Type describes the original file, not the compressed bytes
+        media_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        return FileResponse(filepath, headers=headers, media_type=media_type)
@@ -0,0 +1,180 @@
+import hashlib
+import mimetypes
+import os
+import re
+from stat import S_ISREG
+from email.utils import formatdate, parsedate_to_datetime
+from uuid import uuid4
+from fastapi import HTTPException, Request, Response, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, JSONResponse
+from etags import etag_matches
+
+UPLOAD_DIR = "uploads"
+os.makedirs(UPLOAD_DIR, exist_ok=True)
+
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(25 * 1024 * 1024)))
+# Allowance on top of MAX_UPLOAD_BYTES for a multipart body's boundaries and other form fields
+MULTIPART_OVERHEAD_BYTES = int(os.getenv("MULTIPART_OVERHEAD_BYTES", str(64 * 1024)))
+CHUNK_SIZE = 1024 * 1024
+
+_SAFE_EXT = re.compile(r"^\.[A-Za-z0-9]{1,10}$")
+_CONTENT_ADDRESSED = re.compile(r"^([0-9a-f]{64})(\.[a-z0-9]{1,10})?$")
+
+# Content-addressed files never change, so clients may keep them for a year.
+# Older uploads named after the client's filename must be revalidated.
+IMMUTABLE_CACHE_CONTROL = "private, max-age=31536000, immutable"
+MUTABLE_CACHE_CONTROL = "private, no-cache"
+
+
+def _extension(filename: str) -> str:
+    ext = os.path.splitext(filename or "")[1].lower()
+    return ext if _SAFE_EXT.match(ext) else ""
+
+
+def _write_content_addressed(src, filename: str):
+    """Copy `src` to uploads/ in CHUNK_SIZE pieces, hashing as it goes.
+
+    The file is named after its SHA-256 alone, so identical uploads share one
+    file on disk whatever they were called. Returns `(filepath, sha256, size)`,
+    where `filepath` is the URL path the attachment row keeps: the hash plus
+    the client's extension, which `serve_upload` maps back to the file.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    tmp_path = os.path.join(UPLOAD_DIR, f".upload-{uuid4().hex}.tmp")
+    try:
+        with open(tmp_path, "wb") as out:
+            while True:
+                chunk = src.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > MAX_UPLOAD_BYTES:
+                    raise HTTPException(
+                        status_code=413,
+                        detail=f"File exceeds the {MAX_UPLOAD_BYTES} byte upload limit",
+                    )
+                digest.update(chunk)
+                out.write(chunk)
+
+        content_hash = digest.hexdigest()
+        stored_path = os.path.join(UPLOAD_DIR, content_hash)
+        if os.path.exists(stored_path):
+            os.remove(tmp_path)
+        else:
+            os.replace(tmp_path, stored_path)
+        return os.path.join(UPLOAD_DIR, content_hash + _extension(filename)), content_hash, size
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+async def save_upload(file: UploadFile):
+    return await run_in_threadpool(_write_content_addressed, file.file, file.filename)
+
+
+def _too_large() -> HTTPException:
+    return HTTPException(status_code=413, detail=f"File exceeds the {MAX_UPLOAD_BYTES} byte upload limit")
+
+
+class UploadLimitMiddleware:
+    """Plain ASGI middleware that stops oversized multipart bodies before they are parsed.
+
+    Starlette spools a whole multipart body to disk before the endpoint sees
+    the UploadFile, so `save_upload`'s check alone would only fire after an
+    oversized body had been received and written. A Content-Length over the
+    limit is refused without reading the body; a chunked body is counted as
+    it arrives and cut off once it passes the limit.
+    """
+
+    def __init__(self, app, max_bytes: int = None):
+        self.app = app
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        headers = dict(scope["headers"])
+        if not headers.get(b"content-type", b"").lower().startswith(b"multipart/"):
+            return await self.app(scope, receive, send)
+
+        limit = self.max_bytes if self.max_bytes is not None else MAX_UPLOAD_BYTES + MULTIPART_OVERHEAD_BYTES
+        try:
+            declared = int(headers.get(b"content-length", b""))
+        except ValueError:
+            declared = None
+        if declared is not None and declared > limit:
+            response = JSONResponse({"detail": _too_large().detail}, status_code=413, headers={"connection": "close"})
+            return await response(scope, receive, send)
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # Re-raised by FastAPI's body parsing and answered by its exception handler
+                    raise _too_large()
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+
+def _not_modified(request: Request, etag: str, last_modified: float) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return etag_matches(if_none_match, etag)
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return int(last_modified) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def serve_upload(request: Request, filename: str) -> Response:
+    """Serve a stored attachment with validators, conditional GET and byte ranges.
+
+    Range and If-Range handling (206/416) comes from FileResponse; this adds
+    strong ETags for content-addressed names, 304 responses and caching.
+    """
+    if filename.startswith(".") or os.path.basename(filename) != filename:
+        raise HTTPException(status_code=404, detail="File not found")
+    match = _CONTENT_ADDRESSED.match(filename)
+    # `<hash>.<ext>` is stored as `<hash>`; uploads from before that keep their extension on disk
+    candidates = [match.group(1), filename] if match else [filename]
+    for name in candidates:
+        path = os.path.join(UPLOAD_DIR, name)
+        try:
+            stat = os.stat(path)
+        except (FileNotFoundError, NotADirectoryError):
+            continue
+        if S_ISREG(stat.st_mode):
+            break
+    else:
+        raise HTTPException(status_code=404, detail="File not found")
+
+    if match:
+        etag = f'"{match.group(1)}"'
+        cache_control = IMMUTABLE_CACHE_CONTROL
+    else:
+        etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+        cache_control = MUTABLE_CACHE_CONTROL
+
+    headers = {
+        "etag": etag,
+        "last-modified": formatdate(stat.st_mtime, usegmt=True),
+        "cache-control": cache_control,
+        "accept-ranges": "bytes",
+    }
+    if _not_modified(request, etag, stat.st_mtime):
+        return Response(status_code=304, headers=headers)
+    # The media type comes from the requested name, which carries the extension
+    media_type = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+    return FileResponse(path, headers=headers, stat_result=stat, media_type=media_type)
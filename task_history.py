@@ -0,0 +1,289 @@
+"""Append-only task history and the daily rollups the trend endpoints read.
+
+Every code path that creates or deletes a task, or changes its status,
+assignee or due date, calls `record` with the transitions (built with
+`created`, `changed` and `deleted`) before committing, so the `task_events`
+rows land in the same transaction as the change. Events are never updated
+or deleted, not even with their task.
+
+`record` also moves the project's `task_daily_stats` row for the current UTC
+day: the created / completed / reopened / deleted counters, the sums behind
+the average cycle and lead times, and the open and total task counts the day
+ended with, copied from project_stats. It therefore runs after
+`project_stats.record_task_change` (or `apply_deltas`), whose UPDATE also
+makes concurrent writers to the project take turns.
+
+The burndown, throughput and cycle-time endpoints read only the rollups:
+one row per day with any activity, however many events that day had.
+Cycle time runs from a task's first move to in-progress until it is done,
+lead time from its creation; tasks created before the history existed are
+counted as completed without either.
+"""
+import os
+from datetime import date, datetime, timedelta
+from fastapi import HTTPException, Query
+from sqlalchemy import select, insert, func, case, or_
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+import models
+
+# Task attribute -> TaskEvent.kind of the fields whose changes are recorded
+TRACKED_FIELDS = {
+    "status": "status",
+    "assignee_id": "assignee",
+    "due_date": "due_date",
+}
+STARTED_STATUS = "in-progress"
+DONE_STATUS = "done"
+FLOW_COLUMNS = ("created", "completed", "reopened", "deleted", "cycle_count", "cycle_seconds", "lead_count", "lead_seconds")
+
+# Range of the trend endpoints: the last ANALYTICS_DEFAULT_DAYS days unless
+# asked otherwise, at most ANALYTICS_MAX_DAYS
+ANALYTICS_DEFAULT_DAYS = int(os.getenv("ANALYTICS_DEFAULT_DAYS", "30"))
+ANALYTICS_MAX_DAYS = int(os.getenv("ANALYTICS_MAX_DAYS", "366"))
+
+_UPSERT = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+
+# -------------------------------
+# Events
+# -------------------------------
+
+def _text(value):
+    if value is None:
+        return None
+    return value.isoformat() if isinstance(value, datetime) else str(value)
+
+
+def _event(task_id: int, kind: str, old=None, new=None) -> dict:
+    return {"task_id": task_id, "kind": kind, "old_value": _text(old), "new_value": _text(new)}
+
+
+def snapshot(task) -> dict:
+    """The tracked fields of a Task (or anything with the same attributes), for `changed`."""
+    return {attr: getattr(task, attr) for attr in TRACKED_FIELDS}
+
+
+def changed(task_id: int, before: dict, after: dict) -> list:
+    """Events for the tracked fields in `after` whose value differs from `before`."""
+    return [
+        _event(task_id, kind, before.get(attr), after[attr])
+        for attr, kind in TRACKED_FIELDS.items()
+        if attr in after and before.get(attr) != after[attr]
+    ]
+
+
+def created(task_id: int, status: str, assignee_id: int = None, due_date: datetime = None) -> list:
+    return [_event(task_id, "created", new=status)] + changed(task_id, {}, {"assignee_id": assignee_id, "due_date": due_date})
+
+
+def deleted(task_id: int, status: str) -> list:
+    return [_event(task_id, "deleted", old=status)]
+
+
+def record(db: Session, project_id: int, events: list, user_id: int = None):
+    """Append `events` to the project's history and roll them into today's task_daily_stats row."""
+    if not events:
+        return
+    now = datetime.utcnow()
+    db.execute(insert(models.TaskEvent), [
+        {**event, "project_id": project_id, "user_id": user_id, "occurred_at": now} for event in events
+    ])
+
+    flows = dict.fromkeys(FLOW_COLUMNS, 0)
+    completed = []
+    for event in events:
+        kind, old, new = event["kind"], event["old_value"], event["new_value"]
+        if kind == "created":
+            flows["created"] += 1
+            if new == DONE_STATUS:
+                completed.append(event["task_id"])
+        elif kind == "deleted":
+            flows["deleted"] += 1
+        elif kind == "status" and new == DONE_STATUS:
+            completed.append(event["task_id"])
+        elif kind == "status" and old == DONE_STATUS:
+            flows["reopened"] += 1
+    flows["completed"] = len(completed)
+    if completed:
+        _add_durations(db, completed, now, flows)
+
+    if any(flows.values()):
+        _roll_up(db, project_id, now.date(), flows)
+
+
+def _add_durations(db: Session, task_ids: list, now: datetime, flows: dict):
+    # The only read of raw events, limited to the tasks being completed (by
+    # the task_id index), and paid by the write instead of every report.
+    event = models.TaskEvent
+    # SQLite can give a new task the id of a deleted one, so only the events
+    # from the task's latest "created" on are its own
+    since = (
+        select(event.task_id, func.max(event.id).label("id"))
+        .where(event.task_id.in_(task_ids), event.kind == "created")
+        .group_by(event.task_id)
+        .subquery()
+    )
+    rows = db.execute(
+        select(
+            event.task_id,
+            func.min(case((event.kind == "created", event.occurred_at))),
+            func.min(case((event.new_value == STARTED_STATUS, event.occurred_at))),
+        )
+        .outerjoin(since, since.c.task_id == event.task_id)
+        .where(
+            event.task_id.in_(task_ids),
+            event.kind.in_(("created", "status")),
+            event.id >= func.coalesce(since.c.id, 0),
+        )
+        .group_by(event.task_id)
+    )
+    for _, created_at, started_at in rows:
+        if created_at is not None:
+            flows["lead_count"] += 1
+            flows["lead_seconds"] += (now - created_at).total_seconds()
+        if started_at is not None:
+            flows["cycle_count"] += 1
+            flows["cycle_seconds"] += (now - started_at).total_seconds()
+
+
+def _roll_up(db: Session, project_id: int, day: date, flows: dict):
+    table = models.TaskDailyStats.__table__
+    stats = models.ProjectStats.__table__
+    # The counters as this transaction leaves them: the latest write of the day wins
+    counts = select(stats).where(stats.c.project_id == project_id).subquery()
+    totals = {
+        "open_tasks": select(counts.c.total - counts.c.done).scalar_subquery(),
+        "total_tasks": select(counts.c.total).scalar_subquery(),
+    }
+
+    upsert = _UPSERT.get(db.get_bind().dialect.name)
+    if upsert is None:
+        # No upsert on this backend. Update, then insert if there was no row
+        # yet: the project_stats UPDATE earlier in the transaction makes the
+        # project's writers take turns, so two cannot both insert the day.
+        updated = db.execute(
+            table.update()
+            .where(table.c.project_id == project_id, table.c.day == day)
+            .values(**totals, **{col: table.c[col] + n for col, n in flows.items() if n})
+        )
+        if not updated.rowcount:
+            db.execute(table.insert().values(project_id=project_id, day=day, **totals, **flows))
+        return
+
+    stmt = upsert(table).values(project_id=project_id, day=day, **totals, **flows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.project_id, table.c.day],
+        set_={
+            "open_tasks": stmt.excluded.open_tasks,
+            "total_tasks": stmt.excluded.total_tasks,
+            **{col: table.c[col] + stmt.excluded[col] for col, n in flows.items() if n},
+        },
+    )
+    db.execute(stmt)
+
+
+# -------------------------------
+# Reports
+# -------------------------------
+
+class DateRange:
+    """`start` / `end` query parameters: UTC days, both included."""
+
+    def __init__(
+        self,
+        start: date = Query(None, description=f"First day (default: {ANALYTICS_DEFAULT_DAYS} days before end)"),
+        end: date = Query(None, description="Last day (default: today, UTC)"),
+    ):
+        self.end = end or datetime.utcnow().date()
+        self.start = start or self.end - timedelta(days=ANALYTICS_DEFAULT_DAYS - 1)
+        if self.start > self.end:
+            raise HTTPException(status_code=400, detail="start must not be after end")
+        if (self.end - self.start).days >= ANALYTICS_MAX_DAYS:
+            raise HTTPException(status_code=400, detail=f"The range may cover at most {ANALYTICS_MAX_DAYS} days")
+
+    def days(self) -> list:
+        return [self.start + timedelta(days=n) for n in range((self.end - self.start).days + 1)]
+
+
+def _daily_rows(db: Session, project_id: int, span: DateRange) -> tuple:
+    """`({day: row}, row before start)` from task_daily_stats, in one query."""
+    table = models.TaskDailyStats.__table__
+    before = (
+        select(func.max(table.c.day))
+        .where(table.c.project_id == project_id, table.c.day < span.start)
+        .scalar_subquery()
+    )
+    rows = db.execute(
+        select(table)
+        .where(table.c.project_id == project_id, or_(table.c.day.between(span.start, span.end), table.c.day == before))
+        .order_by(table.c.day)
+    ).mappings().all()
+    by_day = {row["day"]: row for row in rows}
+    previous = rows[0] if rows and rows[0]["day"] < span.start else None
+    return by_day, previous
+
+
+def _hours(seconds: float, count: int):
+    return round(seconds / count / 3600, 2) if count else None
+
+
+def burndown(db: Session, project_id: int, span: DateRange) -> dict:
+    """Open and total tasks at the end of each day, with the day's created and completed counts.
+
+    Counts are None for days before the project's history begins.
+    """
+    by_day, last = _daily_rows(db, project_id, span)
+    days = []
+    for day in span.days():
+        row = by_day.get(day)
+        if row is not None and row["total_tasks"] is not None:
+            last = row
+        days.append({
+            "date": day,
+            "open": last["open_tasks"] if last else None,
+            "total": last["total_tasks"] if last else None,
+            "created": row["created"] if row else 0,
+            "completed": row["completed"] if row else 0,
+        })
+    return {"start": span.start, "end": span.end, "days": days}
+
+
+def throughput(db: Session, project_id: int, span: DateRange) -> dict:
+    by_day, _ = _daily_rows(db, project_id, span)
+    days = [
+        {"date": day, **{col: by_day[day][col] if day in by_day else 0 for col in ("created", "completed", "reopened", "deleted")}}
+        for day in span.days()
+    ]
+    return {
+        "start": span.start,
+        "end": span.end,
+        "created": sum(d["created"] for d in days),
+        "completed": sum(d["completed"] for d in days),
+        "days": days,
+    }
+
+
+def cycle_time(db: Session, project_id: int, span: DateRange) -> dict:
+    """Average cycle and lead times, in hours, of the tasks completed on each day and over the range."""
+    by_day, _ = _daily_rows(db, project_id, span)
+    days, totals = [], dict.fromkeys(("completed", "cycle_count", "cycle_seconds", "lead_count", "lead_seconds"), 0)
+    for day in span.days():
+        row = by_day.get(day)
+        if row is not None:
+            for col in totals:
+                totals[col] += row[col]
+        days.append({
+            "date": day,
+            "completed": row["completed"] if row else 0,
+            "avg_cycle_hours": _hours(row["cycle_seconds"], row["cycle_count"]) if row else None,
+            "avg_lead_hours": _hours(row["lead_seconds"], row["lead_count"]) if row else None,
+        })
+    return {
+        "start": span.start,
+        "end": span.end,
+        "completed": totals["completed"],
+        "avg_cycle_hours": _hours(totals["cycle_seconds"], totals["cycle_count"]),
+        "avg_lead_hours": _hours(totals["lead_seconds"], totals["lead_count"]),
+        "days": days,
+    }
@@ -0,0 +1,69 @@
+import asyncio
+
+from broker import RESYNC, InProcessBroker
+from routers import events
+
+
+def drain(queue) -> list:
+    items = []
+    while not queue.empty():
+        items.append(queue.get_nowait())
+    return items
+
+
+def test_events_fan_out_to_the_project_subscribers():
+    async def scenario():
+        broker = InProcessBroker()
+        async with broker.subscribe(1) as first, broker.subscribe(1) as second, broker.subscribe(2) as other:
+            await broker.publish(1, [{"type": "task.deleted", "task_id": 7}])
+            return drain(first), drain(second), drain(other)
+
+    first, second, other = asyncio.run(scenario())
+    assert first == second == [[{"type": "task.deleted", "task_id": 7}]]
+    assert other == []
+
+
+def test_a_subscriber_that_falls_behind_gets_one_resync():
+    async def scenario():
+        broker = InProcessBroker(queue_size=3)
+        async with broker.subscribe(1) as queue:
+            for task_id in range(broker.queue_size + 1):
+                await broker.publish(1, [{"type": "task.deleted", "task_id": task_id}])
+            return drain(queue)
+
+    assert asyncio.run(scenario()) == [[RESYNC]]
+
+
+def test_unsubscribing_forgets_the_project():
+    async def scenario():
+        broker = InProcessBroker()
+        async with broker.subscribe(1):
+            pass
+        await broker.publish(1, [{"type": "task.deleted", "task_id": 1}])
+        return broker._subscribers
+
+    assert asyncio.run(scenario()) == {}
+
+
+class ClosedSession:
+    async def close(self):
+        pass
+
+
+def test_stream_is_framed_as_server_sent_events():
+    async def scenario():
+        response = await events.stream_project_events(1, db=ClosedSession(), access=None)
+        assert response.media_type == "text/event-stream"
+        assert response.headers["cache-control"] == "no-cache"
+        body = response.body_iterator
+        try:
+            ready = await anext(body)
+            await events.broker.publish(1, [{"type": "task.deleted", "task_id": 7}, {"type": "resync"}])
+            return ready, await anext(body), await anext(body)
+        finally:
+            await body.aclose()
+
+    ready, deleted, resync = asyncio.run(scenario())
+    assert ready == 'event: ready\ndata: {"type":"ready"}\n\n'
+    assert deleted == 'event: task.deleted\ndata: {"type":"task.deleted","task_id":7}\n\n'
+    assert resync == 'event: resync\ndata: {"type":"resync"}\n\n'
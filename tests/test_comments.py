@@ -0,0 +1,26 @@
+def test_comment_pages_cover_every_comment(client, make_user, make_project):
+    headers, _ = make_user()
+    project_id = make_project(headers)
+    task_id = client.post(f"/projects/{project_id}/tasks", data={"title": "T"}, headers=headers).json()["id"]
+    # Created within the same second: the case a timestamp keyset got wrong on SQLite
+    posted = [client.post(f"/tasks/{task_id}/comments", json={"content": f"c{n}"}, headers=headers).json()["id"]
+              for n in range(7)]
+
+    seen, cursor = [], None
+    while True:
+        url = f"/tasks/{task_id}/comments?limit=3" + (f"&after={cursor}" if cursor else "")
+        response = client.get(url, headers=headers)
+        assert response.status_code == 200
+        seen += [comment["id"] for comment in response.json()]
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+
+    assert seen == posted
+
+
+def test_invalid_comment_cursor(client, make_user, make_project):
+    headers, _ = make_user()
+    project_id = make_project(headers)
+    task_id = client.post(f"/projects/{project_id}/tasks", data={"title": "T"}, headers=headers).json()["id"]
+    assert client.get(f"/tasks/{task_id}/comments?after=nonsense", headers=headers).status_code == 400
@@ -0,0 +1,51 @@
+from sqlalchemy import update
+
+import database
+import models
+
+
+def add_member(client, headers, project_id, user_id, role):
+    response = client.post(f"/projects/{project_id}/members", json={"user_id": user_id, "role": role}, headers=headers)
+    assert response.status_code == 200, response.text
+
+
+def test_a_legacy_role_can_be_replaced(client, make_user, make_project):
+    owner, _ = make_user()
+    _, member_id = make_user()
+    project_id = make_project(owner)
+    add_member(client, owner, project_id, member_id, "editor")
+    with database.SessionLocal() as db:
+        db.execute(
+            update(models.ProjectMember)
+            .where(models.ProjectMember.project_id == project_id, models.ProjectMember.user_id == member_id)
+            .values(role="collaborator")
+        )
+        db.commit()
+
+    response = client.put(f"/projects/{project_id}/members/{member_id}", json={"role": "viewer"}, headers=owner)
+    assert response.status_code == 200, response.text
+    assert response.json()["role"] == "viewer"
+
+
+def test_only_the_new_role_must_be_valid(client, make_user, make_project):
+    owner, _ = make_user()
+    _, member_id = make_user()
+    project_id = make_project(owner)
+    add_member(client, owner, project_id, member_id, "viewer")
+
+    response = client.put(f"/projects/{project_id}/members/{member_id}", json={"role": "superuser"}, headers=owner)
+    assert response.status_code == 400
+
+
+def test_admins_cannot_demote_admins(client, make_user, make_project):
+    owner, _ = make_user()
+    admin, admin_id = make_user()
+    _, other_admin_id = make_user()
+    project_id = make_project(owner)
+    add_member(client, owner, project_id, admin_id, "admin")
+    add_member(client, owner, project_id, other_admin_id, "admin")
+
+    response = client.put(f"/projects/{project_id}/members/{other_admin_id}", json={"role": "viewer"}, headers=admin)
+    assert response.status_code == 403
+    response = client.put(f"/projects/{project_id}/members/{other_admin_id}", json={"role": "viewer"}, headers=owner)
+    assert response.status_code == 200
@@ -0,0 +1,112 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import metrics
+
+ROUTE = "/projects/{project_id}/tasks"
+
+
+def samples(text: str) -> dict:
+    """`{name{labels}: value}` from the text exposition."""
+    parsed = {}
+    for line in text.splitlines():
+        if line and not line.startswith("#"):
+            key, _, value = line.rpartition(" ")
+            parsed[key] = float(value)
+    return parsed
+
+
+def series(name: str, route: str, **labels) -> str:
+    pairs = {"method": "GET", "route": route, **labels}
+    return name + "{" + ",".join(f'{key}="{value}"' for key, value in pairs.items()) + "}"
+
+
+def scrape(client) -> dict:
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    return samples(response.text)
+
+
+def test_requests_are_labelled_with_their_route_template(client, make_user, make_project):
+    headers, _ = make_user()
+    projects = [make_project(headers), make_project(headers)]
+    count = series("teamsync_http_request_db_statements_count", ROUTE)
+    statements = series("teamsync_http_request_db_statements_sum", ROUTE)
+    requests = series("teamsync_http_requests_total", ROUTE, status=200)
+    before = scrape(client)
+
+    for project_id in projects:
+        assert client.get(f"/projects/{project_id}/tasks", headers=headers).status_code == 200
+    after = scrape(client)
+
+    assert after[count] - before.get(count, 0) == 2
+    assert after[requests] - before.get(requests, 0) == 2
+    assert after[statements] - before.get(statements, 0) > 0
+    # One series for the template, none for the raw paths
+    assert not [key for key in after if f"/projects/{projects[0]}/" in key]
+
+
+@pytest.fixture
+def isolated():
+    """An app with its own metrics registry and an instrumented SQLite engine."""
+    from sqlalchemy import create_engine, text
+
+    registry = metrics.RequestMetrics()
+    engine = create_engine("sqlite://")
+    metrics.instrument_engine(engine)
+    app = FastAPI()
+
+    @app.get("/items/{item_id}")
+    def get_item(item_id: int):
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+            conn.execute(text("SELECT 2"))
+        return {"id": item_id}
+
+    app.add_middleware(metrics.MetricsMiddleware, metrics=registry)
+    with TestClient(app) as client:
+        yield client, registry
+    engine.dispose()
+
+
+def test_statements_are_counted_per_request(isolated):
+    client, registry = isolated
+    client.get("/items/1")
+    client.get("/items/2")
+
+    parsed = samples(metrics.render(registry))
+    route = "/items/{item_id}"
+    assert parsed[series("teamsync_http_requests_total", route, status=200)] == 2
+    assert parsed[series("teamsync_http_request_db_statements_sum", route)] == 4
+    assert parsed[series("teamsync_http_request_db_statements_count", route)] == 2
+    # Two statements each: both land in the le="2" bucket, and buckets are cumulative
+    bucket = "teamsync_http_request_db_statements_bucket"
+    assert parsed[series(bucket, route, le=1)] == 0
+    assert parsed[series(bucket, route, le=2)] == 2
+    assert parsed[series(bucket, route, le="+Inf")] == 2
+
+
+def test_unmatched_paths_share_one_label(isolated):
+    client, registry = isolated
+    client.get("/nope")
+    client.get("/also/nope")
+
+    parsed = samples(metrics.render(registry))
+    assert parsed[series("teamsync_http_requests_total", metrics.UNMATCHED_ROUTE, status=404)] == 2
+    assert not [key for key in parsed if "nope" in key]
+
+
+def test_text_exposition_declares_each_family_once(isolated):
+    client, registry = isolated
+    client.get("/items/1")
+
+    text = metrics.render(registry)
+    assert text.endswith("\n")
+    types = [line for line in text.splitlines() if line.startswith("# TYPE ")]
+    assert len(types) == len(set(types))
+    assert "# TYPE teamsync_http_requests_total counter" in types
+    assert "# TYPE teamsync_http_request_duration_seconds histogram" in types
+    # Finished requests leave nothing in flight
+    assert not [key for key in samples(text) if key.startswith("teamsync_http_requests_in_flight")]
@@ -0,0 +1,74 @@
+import os
+import threading
+import time
+
+import pytest
+from sqlalchemy import update
+
+import database
+import models
+import project_stats
+
+pytestmark = pytest.mark.skipif(
+    not os.environ.get("DATABASE_URL", "").startswith("postgresql"),
+    reason="row locks need a PostgreSQL DATABASE_URL",
+)
+
+
+def counters(project_id):
+    with database.SessionLocal() as db:
+        stats = db.get(models.ProjectStats, project_id)
+        return {col: getattr(stats, col) for col in project_stats.COUNTER_COLUMNS}
+
+
+def while_another_writer_marks_done(task_id, project_id, request):
+    """Run `request()` while an open transaction moves the task from pending to done."""
+    with database.SessionLocal() as db:
+        db.execute(update(models.Task).where(models.Task.id == task_id).values(status="done"))
+        project_stats.record_task_change(db, project_id, old_status="pending", new_status="done")
+
+        responses = []
+        thread = threading.Thread(target=lambda: responses.append(request()))
+        thread.start()
+        time.sleep(0.5)
+        assert thread.is_alive(), "the request did not wait for the task's row lock"
+        db.commit()
+    thread.join(10)
+    return responses[0]
+
+
+@pytest.fixture
+def task(client, make_user, make_project):
+    headers, _ = make_user()
+    project_id = make_project(headers)
+    response = client.post(f"/projects/{project_id}/tasks", data={"title": "t"}, headers=headers)
+    assert response.status_code == 200, response.text
+    return headers, project_id, response.json()["id"]
+
+
+def test_update_moves_counters_from_the_committed_status(client, task):
+    headers, project_id, task_id = task
+    response = while_another_writer_marks_done(
+        task_id, project_id, lambda: client.patch(f"/tasks/{task_id}", json={"status": "in-progress"}, headers=headers)
+    )
+    assert response.status_code == 200, response.text
+    assert counters(project_id) == {"total": 1, "pending": 0, "in_progress": 1, "done": 0}
+
+
+def test_batch_update_moves_counters_from_the_committed_status(client, task):
+    headers, project_id, task_id = task
+    ops = {"ops": [{"op": "update", "id": task_id, "status": "in-progress"}]}
+    response = while_another_writer_marks_done(
+        task_id, project_id, lambda: client.post(f"/projects/{project_id}/tasks/batch", json=ops, headers=headers)
+    )
+    assert response.status_code == 200, response.text
+    assert counters(project_id) == {"total": 1, "pending": 0, "in_progress": 1, "done": 0}
+
+
+def test_delete_moves_counters_from_the_committed_status(client, task):
+    headers, project_id, task_id = task
+    response = while_another_writer_marks_done(
+        task_id, project_id, lambda: client.delete(f"/tasks/{task_id}", headers=headers)
+    )
+    assert response.status_code == 200, response.text
+    assert counters(project_id) == {"total": 0, "pending": 0, "in_progress": 0, "done": 0}
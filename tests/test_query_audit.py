@@ -0,0 +1,97 @@
+import logging
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import StaticPool
+
+import query_audit
+from query_audit import assert_max_queries, capture_queries, fingerprint
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT)"))
+        conn.execute(text("INSERT INTO items (id, name) VALUES (1, 'a'), (2, 'b'), (3, 'c'), (4, 'd'), (5, 'e'), (6, 'f')"))
+    yield engine
+    engine.dispose()
+
+
+def run(engine, statements):
+    with engine.connect() as conn:
+        for statement in statements:
+            conn.execute(text(statement))
+
+
+def test_fingerprint_folds_literals_and_in_lists():
+    assert fingerprint("SELECT * FROM t WHERE id = 12 AND name = 'x'") == fingerprint("SELECT * FROM t WHERE id = 7 AND name = 'y'")
+    assert fingerprint("SELECT * FROM t WHERE id IN (?, ?, ?)") == "SELECT * FROM t WHERE id IN (...)"
+    assert fingerprint("SELECT * FROM t WHERE id = 1") != fingerprint("SELECT * FROM u WHERE id = 1")
+
+
+def test_detector_flags_a_repeated_per_row_statement(engine, caplog):
+    app = FastAPI()
+
+    @app.get("/items")
+    def list_items():
+        # One lookup per row: the N+1 shape the detector is for
+        run(engine, [f"SELECT name FROM items WHERE id = {item_id}" for item_id in range(1, 7)])
+        return []
+
+    @app.get("/items/batched")
+    def list_items_batched():
+        run(engine, ["SELECT id, name FROM items WHERE id IN (1, 2, 3, 4, 5, 6)"])
+        return []
+
+    query_audit.install(app, engine)
+    with caplog.at_level(logging.WARNING, logger="query_audit"), TestClient(app) as client:
+        client.get("/items/batched")
+        assert not caplog.records
+        client.get("/items")
+
+    assert len(caplog.records) == 1
+    message = caplog.records[0].getMessage()
+    assert "Possible N+1 in GET /items" in message
+    assert "6 executions" in message
+    assert "SELECT name FROM items WHERE id = ?" in message
+
+
+def test_detector_threshold():
+    threshold = query_audit.QUERY_AUDIT_THRESHOLD
+    log = query_audit.QueryLog()
+    for item_id in range(threshold):
+        log.record(f"SELECT name FROM items WHERE id = {item_id}")
+    assert log.repeated(threshold) == []
+
+    log.record("SELECT name FROM items WHERE id = 99")
+    assert [(shape, count) for shape, count, _ in log.repeated(threshold)] == [
+        ("SELECT name FROM items WHERE id = ?", threshold + 1)
+    ]
+
+
+def test_assert_max_queries_passes_at_the_limit(engine):
+    with assert_max_queries(3, engine) as log:
+        run(engine, ["SELECT 1", "SELECT 2", "SELECT 3"])
+    assert log.total == 3
+
+
+def test_assert_max_queries_raises_above_the_limit(engine):
+    with pytest.raises(AssertionError, match="Expected at most 2 queries, 3 were executed"):
+        with assert_max_queries(2, engine):
+            run(engine, ["SELECT 1", "SELECT 2", "SELECT 3"])
+
+
+def test_assert_max_queries_repeat_threshold(engine):
+    with pytest.raises(AssertionError, match="possible N\\+1"):
+        with assert_max_queries(10, engine, repeat_threshold=2):
+            run(engine, [f"SELECT name FROM items WHERE id = {item_id}" for item_id in (1, 2, 3)])
+
+
+def test_capture_stops_listening_after_the_block(engine):
+    with capture_queries(engine) as log:
+        run(engine, ["SELECT 1"])
+    run(engine, ["SELECT 2"])
+    assert log.total == 1
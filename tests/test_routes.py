@@ -0,0 +1,19 @@
+from collections import Counter
+
+from fastapi.routing import APIRoute
+
+
+def api_routes(routes):
+    for route in routes:
+        if isinstance(route, APIRoute):
+            yield route
+        elif hasattr(route, "original_router"):
+            # An included router; main.py includes them all without a prefix
+            yield from api_routes(route.original_router.routes)
+
+
+def test_no_route_is_shadowed_by_another(app):
+    # The first match is served, so a second route with the same method and
+    # path can never run
+    routes = Counter((method, route.path) for route in api_routes(app.routes) for method in route.methods)
+    assert [key for key, count in routes.items() if count > 1] == []
@@ -0,0 +1,48 @@
+import asyncio
+
+import pytest
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import create_engine
+
+import schema_version
+from schema_version import SchemaMismatch, check_heads, verify_schema
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'schema.db'}")
+    yield engine
+    engine.dispose()
+
+
+def upgrade(engine, revision):
+    config = Config(schema_version.ALEMBIC_INI)
+    with engine.connect() as connection:
+        config.attributes["connection"] = connection
+        command.upgrade(config, revision)
+
+
+def test_check_heads():
+    head = frozenset({"b"})
+    check_heads(head, head)
+    with pytest.raises(SchemaMismatch, match=f"alembic stamp {schema_version.LEGACY_CREATE_ALL_REVISION} && alembic upgrade head"):
+        check_heads(frozenset(), head)
+    with pytest.raises(SchemaMismatch, match="at revision a, this code expects b"):
+        check_heads(frozenset({"a"}), head)
+
+
+def test_verify_schema_without_a_revision(engine):
+    with pytest.raises(SchemaMismatch, match="no Alembic revision"):
+        asyncio.run(verify_schema(engine, retries=0))
+
+
+def test_verify_schema_behind_head(engine):
+    upgrade(engine, schema_version.LEGACY_CREATE_ALL_REVISION)
+    with pytest.raises(SchemaMismatch, match=f"at revision {schema_version.LEGACY_CREATE_ALL_REVISION}"):
+        asyncio.run(verify_schema(engine, retries=0))
+
+
+def test_verify_schema_at_head(engine):
+    upgrade(engine, "head")
+    asyncio.run(verify_schema(engine, retries=0))
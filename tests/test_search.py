@@ -0,0 +1,38 @@
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+
+import search
+from pagination import encode_cursor
+
+
+def test_search_finds_tasks_and_comments(client, make_user, make_project):
+    headers, _ = make_user()
+    project_id = make_project(headers)
+    task = client.post(f"/projects/{project_id}/tasks", data={"title": "Fix the login form"}, headers=headers).json()
+    other = client.post(f"/projects/{project_id}/tasks", data={"title": "Write docs"}, headers=headers).json()
+    client.post(f"/tasks/{other['id']}/comments", json={"content": "blocked on the login fix"}, headers=headers)
+
+    response = client.get(f"/projects/{project_id}/search", params={"q": "login"}, headers=headers)
+    assert response.status_code == 200, response.text
+    hits = {(hit["kind"], hit["task_id"]) for hit in response.json()}
+    assert hits == {("task", task["id"]), ("comment", other["id"])}
+    assert all("<mark>" in hit["snippet"] for hit in response.json())
+
+
+def test_search_on_a_backend_without_full_text_search_is_501():
+    db = SimpleNamespace(get_bind=lambda: SimpleNamespace(dialect=SimpleNamespace(name="mysql")))
+    with pytest.raises(HTTPException) as error:
+        search.search_project(db, 1, "login", 10)
+    assert error.value.status_code == 501
+
+
+@pytest.mark.parametrize("offset", [-5, "3"])
+def test_search_rejects_an_invalid_offset_cursor(client, make_user, make_project, offset):
+    headers, _ = make_user()
+    project_id = make_project(headers)
+    params = {"q": "login", "after": encode_cursor(offset)}
+    response = client.get(f"/projects/{project_id}/search", params=params, headers=headers)
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid pagination cursor"
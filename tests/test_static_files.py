@@ -0,0 +1,84 @@
+import gzip
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import build_static
+from static_files import PrecompressedStaticFiles, choose_encoding
+
+# Optional: without it the build has gzip variants only
+brotli = build_static.brotli
+needs_brotli = pytest.mark.skipif(brotli is None, reason="brotli is not installed")
+
+PAGE = b"<!doctype html><p>" + b"hello, board " * 200 + b"</p>"
+
+
+@pytest.fixture
+def static_client(tmp_path):
+    (tmp_path / "page.html").write_bytes(PAGE)
+    (tmp_path / "tiny.txt").write_bytes(b"x")  # compression would not pay off
+    build_static.build(str(tmp_path))
+    app = FastAPI()
+    app.mount("/static", PrecompressedStaticFiles(directory=str(tmp_path)), name="static")
+    with TestClient(app) as client:
+        yield client
+
+
+def get(client, path, accept_encoding, **headers):
+    # Raw bytes: the test checks the encoding rather than letting httpx undo it
+    with client.stream("GET", path, headers={"Accept-Encoding": accept_encoding, **headers}) as response:
+        response.raw = b"".join(response.iter_raw())
+    return response
+
+
+@pytest.mark.parametrize("accept_encoding, expected", [
+    ("gzip, deflate, br", "br"),
+    ("gzip", "gzip"),
+    ("br;q=0.5, gzip", "gzip"),
+    ("*", "br"),
+    ("gzip;q=0.5, *;q=0.1", "gzip"),
+    ("br;q=0, *", "gzip"),
+    ("identity", None),
+    ("", None),
+    ("gzip;q=0.5, identity", None),
+    ("gzip;q=bogus", None),
+])
+def test_choose_encoding(accept_encoding, expected):
+    assert choose_encoding(accept_encoding, ["br", "gzip"]) == expected
+
+
+def test_choose_encoding_only_picks_a_built_variant():
+    assert choose_encoding("br", ["gzip"]) is None
+    assert choose_encoding("*", ["gzip"]) == "gzip"
+
+
+@pytest.mark.parametrize("accept_encoding, encoding, decode", [
+    pytest.param("br, gzip", "br", lambda data: brotli.decompress(data), marks=needs_brotli),
+    ("gzip", "gzip", gzip.decompress),
+    ("identity", None, bytes),
+])
+def test_serves_the_precompressed_variant(static_client, accept_encoding, encoding, decode):
+    response = get(static_client, "/static/page.html", accept_encoding)
+    assert response.status_code == 200
+    assert response.headers.get("content-encoding") == encoding
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.headers["content-type"].startswith("text/html")
+    assert response.headers["cache-control"] == "no-cache"
+    assert decode(response.raw) == PAGE
+
+
+@needs_brotli
+def test_each_encoding_has_its_own_etag(static_client):
+    etags = {get(static_client, "/static/page.html", ae).headers["etag"] for ae in ("br", "gzip", "identity")}
+    assert len(etags) == 3
+    etag = get(static_client, "/static/page.html", "gzip").headers["etag"]
+    assert get(static_client, "/static/page.html", "gzip", **{"If-None-Match": etag}).status_code == 304
+    assert get(static_client, "/static/page.html", "br", **{"If-None-Match": etag}).status_code == 200
+
+
+def test_file_without_variants_is_sent_as_is(static_client):
+    response = get(static_client, "/static/tiny.txt", "br, gzip")
+    assert response.status_code == 200
+    assert "content-encoding" not in response.headers
+    assert response.raw == b"x"
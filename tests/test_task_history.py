@@ -0,0 +1,49 @@
+import task_history
+
+
+def create_task(client, headers, project_id, title="t"):
+    response = client.post(f"/projects/{project_id}/tasks", data={"title": title}, headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json()["id"]
+
+
+def set_status(client, headers, task_id, status):
+    response = client.patch(f"/tasks/{task_id}", json={"status": status}, headers=headers)
+    assert response.status_code == 200, response.text
+
+
+def report(client, headers, project_id, name):
+    response = client.get(f"/projects/{project_id}/analytics/{name}", headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_rollups_without_an_upsert(client, make_user, make_project, monkeypatch):
+    monkeypatch.setattr(task_history, "_UPSERT", {})
+    headers, _ = make_user()
+    project_id = make_project(headers)
+    first = create_task(client, headers, project_id)
+    create_task(client, headers, project_id)
+    set_status(client, headers, first, "done")
+
+    throughput = report(client, headers, project_id, "throughput")
+    assert (throughput["created"], throughput["completed"]) == (2, 1)
+    today = report(client, headers, project_id, "burndown")["days"][-1]
+    assert (today["open"], today["total"]) == (1, 2)
+
+
+def test_durations_ignore_the_events_of_a_deleted_task_with_the_same_id(client, make_user, make_project):
+    headers, _ = make_user()
+    project_id = make_project(headers)
+    # The newest task is deleted, so SQLite hands its id to the next one
+    old = create_task(client, headers, project_id)
+    set_status(client, headers, old, "in-progress")
+    assert client.delete(f"/tasks/{old}", headers=headers).status_code == 200
+    new = create_task(client, headers, project_id)
+    set_status(client, headers, new, "done")
+
+    cycle_time = report(client, headers, project_id, "cycle-time")
+    assert cycle_time["completed"] == 1
+    # Never in progress, so no cycle time; lead time from its own creation
+    assert cycle_time["avg_cycle_hours"] is None
+    assert cycle_time["avg_lead_hours"] == 0
@@ -0,0 +1,51 @@
+import pytest
+
+from query_audit import assert_max_queries, capture_queries
+
+# Statements for one listing page: the project version (ETag), the task rows
+# and one per included list; the role and the user come from their caches
+LISTING_QUERIES = {"": 2, "?include=attachments,comments": 4}
+
+
+def add_tasks(client, headers, project_id, count):
+    ops = [{"op": "create", "title": f"Task {n}", "description": "d"} for n in range(count)]
+    response = client.post(f"/projects/{project_id}/tasks/batch", json={"ops": ops}, headers=headers)
+    assert response.status_code == 200, response.text
+    for result in response.json()["results"][::2]:
+        client.post(f"/tasks/{result['id']}/comments", json={"content": "c"}, headers=headers)
+
+
+def listing_queries(client, headers, project_id, query):
+    url = f"/projects/{project_id}/tasks{query}"
+    # Warm the access and user caches, which a board's reads share
+    assert client.get(url, headers=headers).status_code == 200
+    with capture_queries() as log:
+        response = client.get(url, headers=headers)
+    assert response.status_code == 200
+    return log.total, len(response.json())
+
+
+@pytest.mark.parametrize("query", list(LISTING_QUERIES))
+def test_listing_query_count_does_not_grow_with_tasks(client, make_user, make_project, query):
+    headers, _ = make_user()
+    small, large = make_project(headers, "small"), make_project(headers, "large")
+    add_tasks(client, headers, small, 3)
+    add_tasks(client, headers, large, 40)
+
+    small_queries, small_rows = listing_queries(client, headers, small, query)
+    large_queries, large_rows = listing_queries(client, headers, large, query)
+
+    assert (small_rows, large_rows) == (3, 40)
+    assert small_queries == large_queries
+
+
+@pytest.mark.parametrize("query, limit", LISTING_QUERIES.items())
+def test_listing_query_budget(client, make_user, make_project, query, limit):
+    headers, _ = make_user()
+    project_id = make_project(headers)
+    add_tasks(client, headers, project_id, 35)
+    url = f"/projects/{project_id}/tasks{query}"
+    client.get(url, headers=headers)
+
+    with assert_max_queries(limit, repeat_threshold=1):
+        assert client.get(url, headers=headers).status_code == 200
@@ -0,0 +1,151 @@
+import hashlib
+import os
+from email.utils import formatdate
+
+import pytest
+
+import storage
+
+CONTENT = b"0123456789abcdef"
+DIGEST = hashlib.sha256(CONTENT).hexdigest()
+
+
+@pytest.fixture
+def stored(tmp_path, monkeypatch):
+    """An attachment stored under its hash; returns its URL."""
+    monkeypatch.setattr(storage, "UPLOAD_DIR", str(tmp_path))
+    (tmp_path / DIGEST).write_bytes(CONTENT)
+    return f"/uploads/{DIGEST}.txt"
+
+
+def test_full_response_has_validators(client, stored):
+    response = client.get(stored)
+    assert response.status_code == 200
+    assert response.content == CONTENT
+    assert response.headers["etag"] == f'"{DIGEST}"'
+    assert response.headers["accept-ranges"] == "bytes"
+    assert response.headers["content-type"].startswith("text/plain")
+    assert "immutable" in response.headers["cache-control"]
+
+
+def test_if_none_match_is_not_modified(client, stored):
+    etag = client.get(stored).headers["etag"]
+    response = client.get(stored, headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == etag
+
+
+def test_if_modified_since_is_not_modified(client, stored):
+    last_modified = client.get(stored).headers["last-modified"]
+    assert client.get(stored, headers={"If-Modified-Since": last_modified}).status_code == 304
+    # Older than the file: sent in full
+    earlier = formatdate(os.stat(os.path.join(storage.UPLOAD_DIR, DIGEST)).st_mtime - 3600, usegmt=True)
+    assert client.get(stored, headers={"If-Modified-Since": earlier}).status_code == 200
+
+
+def test_if_none_match_takes_precedence(client, stored):
+    last_modified = client.get(stored).headers["last-modified"]
+    response = client.get(stored, headers={"If-None-Match": '"other"', "If-Modified-Since": last_modified})
+    assert response.status_code == 200
+
+
+def test_range(client, stored):
+    response = client.get(stored, headers={"Range": "bytes=0-3"})
+    assert response.status_code == 206
+    assert response.content == CONTENT[:4]
+    assert response.headers["content-range"] == f"bytes 0-3/{len(CONTENT)}"
+
+
+def test_unsatisfiable_range(client, stored):
+    response = client.get(stored, headers={"Range": f"bytes={len(CONTENT) + 10}-"})
+    assert response.status_code == 416
+    assert response.headers["content-range"] == f"bytes */{len(CONTENT)}"
+
+
+def test_missing_and_hidden_files(client, stored):
+    assert client.get("/uploads/" + "0" * 64 + ".txt").status_code == 404
+    assert client.get("/uploads/.upload-x.tmp").status_code == 404
+
+
+# -------------------------------
+# Writes
+# -------------------------------
+
+@pytest.fixture
+def upload_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "UPLOAD_DIR", str(tmp_path))
+    return tmp_path
+
+
+@pytest.fixture
+def task_url(client, make_user, make_project):
+    headers, _ = make_user()
+    project_id = make_project(headers)
+    task = client.post(f"/projects/{project_id}/tasks", data={"title": "t"}, headers=headers).json()
+    return f"/tasks/{task['id']}/upload", headers
+
+
+def stored_files(upload_dir):
+    return sorted(path.name for path in upload_dir.iterdir())
+
+
+def test_upload_is_stored_under_its_hash(client, upload_dir, task_url):
+    url, headers = task_url
+    response = client.post(url, files={"file": ("notes.TXT", CONTENT)}, headers=headers)
+    assert response.status_code == 200, response.text
+    assert response.json()["filename"] == "notes.TXT"
+    assert os.path.basename(response.json()["filepath"]) == f"{DIGEST}.txt"
+    assert stored_files(upload_dir) == [DIGEST]
+    assert (upload_dir / DIGEST).read_bytes() == CONTENT
+
+
+def test_identical_uploads_share_one_file(client, upload_dir, task_url):
+    url, headers = task_url
+    first = client.post(url, files={"file": ("a.txt", CONTENT)}, headers=headers).json()
+    second = client.post(url, files={"file": ("b.md", CONTENT)}, headers=headers).json()
+    assert first["id"] != second["id"]
+    assert os.path.basename(first["filepath"]) == f"{DIGEST}.txt"
+    assert os.path.basename(second["filepath"]) == f"{DIGEST}.md"
+    assert stored_files(upload_dir) == [DIGEST]
+
+
+@pytest.fixture
+def small_limit(monkeypatch):
+    """A 1 KiB limit; returns the files that reached `save_upload` (there should be none)."""
+    monkeypatch.setattr(storage, "MAX_UPLOAD_BYTES", 1024)
+    monkeypatch.setattr(storage, "MULTIPART_OVERHEAD_BYTES", 256)
+    saved = []
+
+    async def save_upload(file):
+        saved.append(file.filename)
+        raise AssertionError("the body should have been refused before parsing")
+
+    monkeypatch.setattr(storage, "save_upload", save_upload)
+    return saved
+
+
+def test_content_length_over_the_limit_is_refused(client, upload_dir, task_url, small_limit):
+    url, headers = task_url
+    response = client.post(url, files={"file": ("big.bin", b"x" * 4096)}, headers=headers)
+    assert response.status_code == 413
+    assert response.headers["connection"] == "close"
+    assert small_limit == []
+    assert stored_files(upload_dir) == []
+
+
+def test_chunked_body_over_the_limit_is_cut_off(client, upload_dir, task_url, small_limit):
+    url, headers = task_url
+
+    def body():
+        yield b'--b\r\nContent-Disposition: form-data; name="file"; filename="big.bin"\r\n\r\n'
+        for _ in range(8):
+            yield b"x" * 512
+        yield b"\r\n--b--\r\n"
+
+    # A generator body is sent without a Content-Length
+    response = client.post(url, content=body(), headers={**headers, "Content-Type": "multipart/form-data; boundary=b"})
+    assert "content-length" not in response.request.headers
+    assert response.status_code == 413
+    assert small_limit == []
+    assert stored_files(upload_dir) == []
@@ -1,9 +1,111 @@
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from threading import BoundedSemaphore, Lock
+from typing import Optional, Tuple
+from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
 from passlib.context import CryptContext
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# bcrypt cost factor. Changing it rehashes each user's password on their next login.
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
 
-def hash_password(password: str) -> str:
+# bcrypt runs in its own processes so a login storm cannot starve the
+# request threadpool or event loop. 0 hashes inline (in the threadpool).
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(os.cpu_count() or 1, 4))))
+# Requests allowed to wait for a worker before new ones get a 503.
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", str(max(PASSWORD_HASH_WORKERS, 1) * 4)))
+
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+    bcrypt__max_rounds=BCRYPT_ROUNDS,
+)
+
+_pool = None
+_pool_lock = Lock()
+# Every hash or verify holds one slot from submission until it returns, so
+# at most workers + max_pending callers (and threadpool threads) wait on bcrypt.
+_slots = BoundedSemaphore(max(PASSWORD_HASH_WORKERS, 1) + PASSWORD_HASH_MAX_PENDING)
+
+
+def _hash(password: str) -> str:
     return pwd_context.hash(password)
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+
+def _verify_and_update(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn rather than fork: the server process is multi-threaded
+            _pool = ProcessPoolExecutor(
+                max_workers=PASSWORD_HASH_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _pool
+
+
+def _reset_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def shutdown_pool():
+    """Stop the hashing workers and wait for them to exit; called when the server shuts down."""
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def _acquire_slot():
+    if not _slots.acquire(blocking=False):
+        raise HTTPException(
+            status_code=503,
+            detail="Too many concurrent sign-ins, please retry shortly",
+            headers={"Retry-After": "1"},
+        )
+
+
+def _pool_broken():
+    _reset_pool()
+    return HTTPException(status_code=503, detail="Password service restarting, please retry")
+
+
+async def _run_async(fn, *args):
+    """Run `fn` in a hashing worker (inline in the threadpool with 0 workers) and await it."""
+    _acquire_slot()
+    try:
+        if PASSWORD_HASH_WORKERS == 0:
+            return await run_in_threadpool(fn, *args)
+        try:
+            return await asyncio.wrap_future(_get_pool().submit(fn, *args))
+        except BrokenProcessPool:
+            raise _pool_broken()
+    finally:
+        _slots.release()
+
+
+async def hash_password_async(password: str) -> str:
+    return await _run_async(_hash, password)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return (await _run_async(_verify_and_update, plain_password, hashed_password))[0]
+
+
+async def verify_and_update_password_async(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """Verify a password and, if its hash uses an outdated cost, return a replacement hash."""
+    return await _run_async(_verify_and_update, plain_password, hashed_password)